@@ -2,8 +2,17 @@
 # Central configuration file for the monitoring system
 
 import os
+import json
+import yaml
 from pathlib import Path
 
+import fastjsonschema
+
+try:
+    from yaml import CSafeLoader as _YamlLoader
+except ImportError:
+    from yaml import SafeLoader as _YamlLoader
+
 # Base paths
 BASE_DIR = Path(__file__).parent.parent
 LOGS_DIR = BASE_DIR / "logs"
@@ -32,6 +41,7 @@ SETTINGS = {
         "flashing_min_changes": 4,
         "gaussian_blur_kernel": 5,
         "morphology_kernel_size": 3,
+        "use_opencl": False,  # HSV + blur su GPU integrata via OpenCL, se presente
     },
     
     # HSV color ranges for LED detection
@@ -74,6 +84,7 @@ SETTINGS = {
     # Notification settings
     "notifications": {
         "enabled": True,
+        "slack_status_changes": False,  # Opt-in: post LED status changes to each camera's slack_webhook_url
         "rate_limit_seconds": 60,  # Minimum time between same-type notifications
         "priority_mapping": {
             "red": "high",
@@ -91,7 +102,11 @@ SETTINGS = {
         "enabled": False,
         "host": "0.0.0.0",
         "port": 8080,
-        "debug": False
+        "debug": False,
+        "jpeg_quality": 70,  # Qualità JPEG dello stream MJPEG
+        "jpeg_refresh_interval": 5.0,  # Secondi massimi di riuso dello stesso JPEG se i LED non cambiano
+        "threads": 32,  # Thread waitress: ogni stream MJPEG ne occupa uno
+        "channel_timeout": 60  # Secondi di inattività prima di chiudere una connessione
     },
     
     # Development/Debug settings
@@ -164,64 +179,112 @@ CREATE INDEX IF NOT EXISTS idx_detections_status ON detections(status);
 """
 
 # Environment variable overrides
+TRUTHY_ENV_VALUES = {"true", "1", "yes"}
+
 def load_env_overrides():
     """Load configuration overrides from environment variables"""
+    env = os.environ
     
     # RTSP credentials from environment
-    if os.getenv("RTSP_USERNAME"):
-        ESP32_CAM_DEFAULTS["username"] = os.getenv("RTSP_USERNAME")
+    username = env.get("RTSP_USERNAME")
+    if username:
+        ESP32_CAM_DEFAULTS["username"] = username
     
-    if os.getenv("RTSP_PASSWORD"):
-        ESP32_CAM_DEFAULTS["password"] = os.getenv("RTSP_PASSWORD")
+    password = env.get("RTSP_PASSWORD")
+    if password:
+        ESP32_CAM_DEFAULTS["password"] = password
     
     # Email settings from environment
-    if os.getenv("SMTP_USERNAME"):
-        SETTINGS["email"] = SETTINGS.get("email", {})
-        SETTINGS["email"]["username"] = os.getenv("SMTP_USERNAME")
+    smtp_username = env.get("SMTP_USERNAME")
+    if smtp_username:
+        SETTINGS.setdefault("email", {})["username"] = smtp_username
     
-    if os.getenv("SMTP_PASSWORD"):
-        SETTINGS["email"] = SETTINGS.get("email", {})
-        SETTINGS["email"]["password"] = os.getenv("SMTP_PASSWORD")
+    smtp_password = env.get("SMTP_PASSWORD")
+    if smtp_password:
+        SETTINGS.setdefault("email", {})["password"] = smtp_password
     
     # Debug mode from environment
-    if os.getenv("DEBUG", "").lower() in ["true", "1", "yes"]:
+    if env.get("DEBUG", "").lower() in TRUTHY_ENV_VALUES:
         SETTINGS["debug"]["verbose_logging"] = True
         SETTINGS["logging"]["level"] = "DEBUG"
     
     # Test mode from environment
-    if os.getenv("TEST_MODE", "").lower() in ["true", "1", "yes"]:
+    if env.get("TEST_MODE", "").lower() in TRUTHY_ENV_VALUES:
         SETTINGS["debug"]["test_mode"] = True
 
 # Load environment overrides on import
 load_env_overrides()
 
+# Validation schemas, compiled once into straight-line validators.
+# Validation errors (JsonSchemaValueException) are ValueError subclasses.
+CAMERA_CONFIG_SCHEMA = {
+    "type": "object",
+    "required": ["rtsp_url", "machine_id"],
+    "properties": {
+        "rtsp_url": {"type": "string", "pattern": "^(rtsp|http)://"},
+        "substream_rtsp_url": {"type": "string", "pattern": "^(rtsp|http)://"},
+        "hwaccel": {"enum": ["none", "any", "vaapi", "d3d11", "mfx"]},
+        "slack_webhook_url": {"type": ["string", "null"]}
+    }
+}
+
+LED_REGION_CONFIG_SCHEMA = {
+    "type": "object",
+    "required": ["name", "x", "y", "width", "height", "machine_id"],
+    "properties": {
+        coord: {"type": "integer", "minimum": 0}
+        for coord in ("x", "y", "width", "height")
+    }
+}
+
+_validate_camera = fastjsonschema.compile(CAMERA_CONFIG_SCHEMA)
+_validate_led_region = fastjsonschema.compile(LED_REGION_CONFIG_SCHEMA)
+
 # Validation functions
 def validate_camera_config(config):
     """Validate camera configuration"""
-    required_fields = ["rtsp_url", "machine_id"]
-    for field in required_fields:
-        if field not in config:
-            raise ValueError(f"Missing required field in camera config: {field}")
-    
-    if not config["rtsp_url"].startswith(("rtsp://", "http://")):
-        raise ValueError("Invalid RTSP URL format")
-    
+    _validate_camera(config)
     return True
 
 def validate_led_region_config(config):
     """Validate LED region configuration"""
-    required_fields = ["name", "x", "y", "width", "height", "machine_id"]
-    for field in required_fields:
-        if field not in config:
-            raise ValueError(f"Missing required field in LED region config: {field}")
-    
-    # Validate coordinates
-    for coord in ["x", "y", "width", "height"]:
-        if not isinstance(config[coord], int) or config[coord] < 0:
-            raise ValueError(f"Invalid {coord} value in LED region config")
-    
+    _validate_led_region(config)
     return True
 
+def _yaml_source_key(path):
+    # mtime in ns, dimensione e inode: una modifica nello stesso secondo, un
+    # orologio non monotono o un file sostituito (checkout, bind mount) cambiano la chiave
+    st = os.stat(path)
+    return [st.st_mtime_ns, st.st_size, st.st_ino]
+
+def load_yaml_cached(path):
+    # Cache JSON accanto al file YAML, valida solo se il YAML è identico
+    # (stessa chiave di _yaml_source_key) a quello da cui è stata generata
+    cache_path = path + '.cache.json'
+    source_key = _yaml_source_key(path)
+    try:
+        with open(cache_path, 'rb') as f:
+            cached = json.load(f)
+        if isinstance(cached, dict) and cached.get('source') == source_key:
+            return cached['config']
+    except (OSError, ValueError, KeyError):
+        pass
+
+    # File binario: libyaml legge e decodifica i byte direttamente
+    with open(path, 'rb') as f:
+        config = yaml.load(f, Loader=_YamlLoader)
+
+    tmp_path = cache_path + '.tmp'
+    try:
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump({'source': source_key, 'config': config}, f)
+        os.replace(tmp_path, cache_path)
+    except (OSError, TypeError):
+        # Directory in sola lettura o valori non serializzabili: niente cache
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+    return config
+
 # Export main settings
 __all__ = [
     "SETTINGS",
@@ -231,5 +294,6 @@ __all__ = [
     "FRIGATE_INTEGRATION",
     "DATABASE_SCHEMA",
     "validate_camera_config",
-    "validate_led_region_config"
+    "validate_led_region_config",
+    "load_yaml_cached"
 ]
\ No newline at end of file
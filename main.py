@@ -1,32 +1,74 @@
 import threading
 import time
 import os
-import sys
 import signal
-import yaml
+import atexit
+import gzip
+import shutil
+import hashlib
+import queue
+import logging
+import logging.handlers
+from collections import deque
 from datetime import datetime
-from flask import Flask, Response, render_template, render_template_string, jsonify, send_from_directory, abort, url_for
+from flask import Flask, Response, request, render_template, render_template_string, send_from_directory, abort, url_for
 import cv2
-
-from src.led_detector import LEDDetector, LEDRegion, LEDStatus
-
-class suppress_stderr:
-    def __enter__(self):
-        self.stderr_fd = sys.stderr.fileno()
-        self.null_fd = os.open(os.devnull, os.O_RDWR)
-        self.old_stderr = os.dup(self.stderr_fd)
-        os.dup2(self.null_fd, self.stderr_fd)
-
-    def __exit__(self, exc_type, exc_val, exc_tb):
-        os.dup2(self.old_stderr, self.stderr_fd)
-        os.close(self.null_fd)
-        os.close(self.old_stderr)
+import numpy as np
+import orjson
+from waitress import serve
+
+from config.settings import SETTINGS, NOTIFICATION_TEMPLATES, load_yaml_cached
+from src.led_detector import LEDDetector, LEDRegion, LEDStatus, STATUS_BGR_COLORS
+from src.rtsp_client import RTSPConfig, RTSPManager
+from src.notification_system import SlackProvider, create_session
+
+# OpenCV e FFmpeg silenziati tramite i loro livelli di log, senza redirigere lo
+# stderr del processo: i tentativi di connessione alle camere offline non riempiono
+# la console, mentre traceback e log degli altri thread restano visibili.
+# Un OPENCV_FFMPEG_LOGLEVEL già presente nell'ambiente vince
+os.environ.setdefault('OPENCV_FFMPEG_LOGLEVEL', '8')  # AV_LOG_FATAL
+cv2.utils.logging.setLogLevel(cv2.utils.logging.LOG_LEVEL_ERROR)
 
 app = Flask(__name__)
+logger = logging.getLogger('shima')
 
 cameras_config = []
 cameras_data = {}
+stop_event = threading.Event()
+rtsp_manager = RTSPManager()
+camera_threads = []
+# Un solo detector per tutte le camere: la storia dei lampeggi è
+# indicizzata per macchina e regione
+shared_detector = LEDDetector(use_opencl=SETTINGS['led_detection']['use_opencl'])
+# Notifiche inviate da un thread dedicato: il ciclo di rilevamento non
+# attende mai la rete, a coda piena la notifica viene scartata
+notification_queue = queue.Queue(maxsize=1000)
 LOG_DIR = "log"
+CAMERAS_CONFIG_FILE = "cameras.yaml"
+
+HISTORY_LENGTH = 10
+LOG_FLUSH_LINES = 32
+LOG_FLUSH_INTERVAL = 1.0
+LOG_BUFFER_SIZE = 64 * 1024  # un blocco di righe = una sola write()
+LOG_COMPRESS_INTERVAL = 3600
+LOG_DOWNLOAD_MAX_AGE = 60
+NOTIFICATION_BATCH_SIZE = 20  # cambi di stato raccolti in un solo messaggio
+NOTIFICATION_BATCH_WAIT = 0.5  # secondi di attesa per completare un gruppo
+PRIORITY_RANK = {"low": 0, "medium": 1, "high": 2}
+JPEG_PARAMS = [cv2.IMWRITE_JPEG_QUALITY, SETTINGS['web_interface']['jpeg_quality'],
+               cv2.IMWRITE_JPEG_OPTIMIZE, 0]
+
+JPEG_REFRESH_INTERVAL = SETTINGS['web_interface']['jpeg_refresh_interval']
+JPEG_BRIGHTNESS_SHIFT = 3  # luminosità confrontata a passi di 8 livelli
+
+MJPEG_PART_HEADER = b'--frame\r\nContent-Type: image/jpeg\r\nContent-Length: %d\r\n\r\n'
+
+LABEL_FONT = cv2.FONT_HERSHEY_SIMPLEX
+LABEL_SCALE = 0.6
+LABEL_THICKNESS = 2
+label_cache = {}
+
+STATUS_GRID_CELLS = 60  # griglia 10x6 di /camera_status
 
 STATE_COLOR_MAP = {
     "off": "#808080",
@@ -41,9 +83,8 @@ STATE_COLOR_MAP = {
 def load_cameras_config():
     global cameras_config, cameras_data
     try:
-        with open('cameras.yaml', 'r') as f:
-            config = yaml.safe_load(f)
-            cameras_config = config.get('cameras', [])
+        config = load_yaml_cached(CAMERAS_CONFIG_FILE)
+        cameras_config = config.get('cameras', [])
 
         for camera in cameras_config:
             if 'operator' not in camera:
@@ -53,9 +94,17 @@ def load_cameras_config():
             machine_id = camera['machine_id']
             cameras_data[machine_id] = {
                 'status': {},
-                'history': [],
-                'detector': LEDDetector(),
-                'log_file': None
+                'history': deque(maxlen=HISTORY_LENGTH),
+                'detector': shared_detector,
+                'log_file': None,
+                # Ultimo frame MJPEG (header, jpeg) pubblicato dal thread della camera
+                'jpeg': None,
+                'jpeg_seq': 0,
+                'jpeg_cond': threading.Condition(),
+                'viewers': 0,  # client /video_feed collegati, protetto da jpeg_cond
+                # Colore della prima regione per /camera_status, aggiornato ai cambi
+                'summary_color': STATE_COLOR_MAP['off'],
+                'notifier': create_notifier(camera)
             }
             cameras_data[machine_id]['log_file'] = open_camera_log(machine_id)
 
@@ -64,98 +113,397 @@ def load_cameras_config():
         print(f"Errore caricamento configurazione camere: {e}")
         cameras_config = []
 
+class LogWriter:
+    # I thread delle camere accodano le righe; un thread dedicato le scrive
+    # a blocchi (fino a LOG_FLUSH_LINES righe o LOG_FLUSH_INTERVAL secondi)
+    # con una sola write e un solo flush per blocco. path_pattern è un formato
+    # strftime: al cambio di data il file viene chiuso e se ne apre uno nuovo
+    def __init__(self, path_pattern):
+        self.path_pattern = path_pattern
+        self.path = datetime.now().strftime(path_pattern)
+        self.file = self._open(self.path)
+        self.queue = queue.Queue()
+        self.thread = threading.Thread(target=self._run, daemon=True)
+        self.thread.start()
+
+    @property
+    def closed(self):
+        return self.file.closed
+
+    @staticmethod
+    def _open(path):
+        return open(path, "a", encoding="utf-8", buffering=LOG_BUFFER_SIZE)
+
+    def _rotate(self):
+        # Chiamato solo dal thread di scrittura, prima di ogni blocco
+        path = datetime.now().strftime(self.path_pattern)
+        if path == self.path:
+            return
+        # Il vecchio file si chiude prima di aggiornare path: compress_old_logs
+        # lo considera aperto finché può ancora ricevere righe
+        self.file.close()
+        self.file = self._open(path)
+        self.path = path
+
+    def write(self, line):
+        self.queue.put(line)
+
+    def close(self):
+        # Sentinella: il writer scrive le righe rimaste e chiude il file
+        if self.thread.is_alive():
+            self.queue.put(None)
+            self.thread.join()
+
+    def _run(self):
+        q = self.queue
+        while True:
+            lines = [q.get()]
+            deadline = time.monotonic() + LOG_FLUSH_INTERVAL
+            while lines[-1] is not None and len(lines) < LOG_FLUSH_LINES:
+                timeout = deadline - time.monotonic()
+                if timeout <= 0:
+                    break
+                try:
+                    lines.append(q.get(timeout=timeout))
+                except queue.Empty:
+                    break
+
+            closing = lines[-1] is None
+            if closing:
+                lines.pop()
+            if lines:
+                self._rotate()
+                self.file.write(''.join(lines))
+                self.file.flush()
+            if closing:
+                self.file.close()
+                return
+
+# Session condivisa dai notifier Slack di tutte le camere: gli invii partono in
+# sequenza da notification_worker, raggruppati per host del webhook
+slack_session = create_session()
+
+def create_notifier(camera):
+    webhook_url = camera.get('slack_webhook_url')
+    # Invio su Slack dei cambi di stato solo se abilitato esplicitamente
+    notification_settings = SETTINGS['notifications']
+    if not (notification_settings['enabled'] and notification_settings['slack_status_changes']):
+        return None
+    if not isinstance(webhook_url, str) or not webhook_url.strip():
+        return None
+    return SlackProvider(webhook_url.strip(), session=slack_session)
+
+def collect_notifications():
+    # Primo evento con attesa, poi quelli arrivati entro NOTIFICATION_BATCH_WAIT
+    # fino a NOTIFICATION_BATCH_SIZE: una raffica di cambi diventa un solo invio
+    try:
+        batch = [notification_queue.get(timeout=1)]
+    except queue.Empty:
+        return []
+    deadline = time.monotonic() + NOTIFICATION_BATCH_WAIT
+    while len(batch) < NOTIFICATION_BATCH_SIZE:
+        remaining = deadline - time.monotonic()
+        if remaining <= 0:
+            break
+        try:
+            batch.append(notification_queue.get(timeout=remaining))
+        except queue.Empty:
+            break
+    return batch
+
+def notification_worker():
+    priority_mapping = SETTINGS['notifications']['priority_mapping']
+    while not stop_event.is_set():
+        # Eventi raggruppati per notifier (uno per camera), in ordine di arrivo
+        groups = {}
+        for notifier, machine_id, region_name, old, current, entry in collect_notifications():
+            text = NOTIFICATION_TEMPLATES['status_change'].format(
+                machine_id=machine_id, region_name=region_name,
+                old_status=old, new_status=current, timestamp=entry['time'])
+            priority = priority_mapping.get(current, 'medium')
+            group = groups.setdefault(notifier, (machine_id, [], [], []))
+            group[1].append(text)
+            group[2].append(priority)
+            group[3].append(entry)
+        # Invii ordinati per host del webhook: le richieste verso lo stesso host
+        # sono consecutive e riusano la connessione keep-alive di slack_session
+        for notifier, (machine_id, texts, priorities, entries) in sorted(
+                groups.items(), key=lambda item: item[0].host):
+            priority = max(priorities, key=PRIORITY_RANK.get)
+            try:
+                success = notifier.send(f"Macchina {machine_id}", "\n".join(texts), priority)
+            except Exception as e:
+                logger.error(f"Errore invio notifica {machine_id}: {e}")
+                success = False
+            # Esito registrato direttamente nelle voci dello storico
+            for entry in entries:
+                entry['success'] = success
+
+_hms_cache = (0, '')
+
+def current_hms():
+    # Orario HH:MM:SS riformattato solo quando cambia il secondo; la tupla
+    # viene sostituita in un colpo solo, quindi è sicura tra i thread
+    global _hms_cache
+    sec = int(time.time())
+    cached = _hms_cache
+    if cached[0] != sec:
+        cached = _hms_cache = (sec, time.strftime("%H:%M:%S", time.localtime(sec)))
+    return cached[1]
+
 def open_camera_log(machine_id):
     os.makedirs(LOG_DIR, exist_ok=True)
-    filename = datetime.now().strftime(f"Log-{machine_id}-%d-%m-%Y.txt")
-    filepath = os.path.join(LOG_DIR, filename)
-    return open(filepath, "a", encoding="utf-8")
+    # Un file per camera e per giorno: i giorni precedenti li comprime log_compression_loop
+    return LogWriter(os.path.join(LOG_DIR, f"Log-{machine_id}-%d-%m-%Y.txt"))
 
-def cleanup_and_exit(signum, frame):
-    print(f"\nSegnale {signum} ricevuto, chiudo file log e arresto...")
+def compress_old_logs():
+    # Comprime in .gz i log giornalieri non più aperti in scrittura
+    open_paths = {os.path.abspath(data['log_file'].path)
+                  for data in cameras_data.values() if data['log_file']}
+    try:
+        names = os.listdir(LOG_DIR)
+    except FileNotFoundError:
+        return
+    for name in names:
+        if not (name.startswith('Log-') and name.endswith('.txt')):
+            continue
+        path = os.path.join(LOG_DIR, name)
+        if os.path.abspath(path) in open_paths:
+            continue
+        tmp_path = path + '.gz.tmp'
+        try:
+            with open(path, 'rb') as src, gzip.open(tmp_path, 'wb', compresslevel=3) as dst:
+                shutil.copyfileobj(src, dst)
+            os.replace(tmp_path, path + '.gz')
+            os.remove(path)
+        except OSError as e:
+            print(f"Errore compressione log {name}: {e}")
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+
+def log_compression_loop():
+    while True:
+        compress_old_logs()
+        if stop_event.wait(LOG_COMPRESS_INTERVAL):
+            break
+
+def setup_logging():
+    # I thread delle camere accodano i messaggi senza bloccarsi sul lock
+    # di stderr; un QueueListener li scrive dal proprio thread
+    log_queue = queue.Queue()
+    logger.addHandler(logging.handlers.QueueHandler(log_queue))
+    logger.setLevel(logging.INFO)
+    logger.propagate = False
+    listener = logging.handlers.QueueListener(log_queue, logging.StreamHandler())
+    listener.start()
+    return listener
+
+def handle_stop_signal(signum, frame):
+    # Nel gestore del segnale solo l'evento: stampa, join dei thread e
+    # chiusura dei log avvengono nel thread principale o all'uscita
+    stop_event.set()
+
+def close_logs():
     for machine_id in cameras_data:
         log_file = cameras_data[machine_id]['log_file']
         if log_file and not log_file.closed:
             log_file.close()
-    sys.exit(0)
 
-signal.signal(signal.SIGINT, cleanup_and_exit)
-signal.signal(signal.SIGTERM, cleanup_and_exit)
+signal.signal(signal.SIGINT, handle_stop_signal)
+signal.signal(signal.SIGTERM, handle_stop_signal)
+atexit.register(close_logs)
+
+def render_label(text, color):
+    # Rasterizza l'etichetta una sola volta: patch colorata, maschera e
+    # offset dell'origine del testo rispetto all'angolo della patch
+    (w, h), baseline = cv2.getTextSize(text, LABEL_FONT, LABEL_SCALE, LABEL_THICKNESS)
+    pad = LABEL_THICKNESS
+    mask = np.zeros((h + baseline + 2 * pad, w + 2 * pad), dtype=np.uint8)
+    cv2.putText(mask, text, (pad, pad + h), LABEL_FONT, LABEL_SCALE, 255, LABEL_THICKNESS)
+    # Bordi sfumati del testo: la copia con maschera è tutto-o-niente
+    mask[mask < 128] = 0
+    patch = np.empty(mask.shape + (3,), dtype=np.uint8)
+    patch[:] = color
+    return patch, mask, pad, pad + h
 
 def draw_overlay(frame, detections):
-    color_map = {
-        LEDStatus.OFF: (128, 128, 128),
-        LEDStatus.GREEN: (0, 255, 0),
-        LEDStatus.YELLOW: (0, 255, 255),
-        LEDStatus.RED: (0, 0, 255),
-        LEDStatus.FLASHING_GREEN: (0, 128, 0),
-        LEDStatus.FLASHING_YELLOW: (0, 128, 255),
-        LEDStatus.FLASHING_RED: (0, 0, 128)
-    }
+    frame_h, frame_w = frame.shape[:2]
     for det in detections:
         region = det.region
-        color = color_map.get(det.status, (255, 255, 255))
-        cv2.rectangle(frame, (region.x, region.y), (region.x + region.width, region.y + region.height), color, 2)
-        label = f"{region.name}: {det.status.value}"
-        cv2.putText(frame, label, (region.x, region.y - 10), cv2.FONT_HERSHEY_SIMPLEX, 0.6, color, 2)
+        color = STATUS_BGR_COLORS[det.status]
+        cv2.rectangle(frame, (region.x, region.y), (region.x1, region.y1), color, 2)
+
+        key = (region.name, det.status)
+        cached = label_cache.get(key)
+        if cached is None:
+            cached = label_cache[key] = render_label(f"{region.name}: {det.status.value}", color)
+        patch, mask, off_x, off_y = cached
+
+        # Incolla l'etichetta già rasterizzata, ritagliata ai bordi del frame
+        x0, y0 = region.x - off_x, region.y - 10 - off_y
+        x1, y1 = x0 + patch.shape[1], y0 + patch.shape[0]
+        cx0, cy0 = max(x0, 0), max(y0, 0)
+        cx1, cy1 = min(x1, frame_w), min(y1, frame_h)
+        if cx0 >= cx1 or cy0 >= cy1:
+            continue
+        cv2.copyTo(patch[cy0 - y0:cy1 - y0, cx0 - x0:cx1 - x0],
+                   mask[cy0 - y0:cy1 - y0, cx0 - x0:cx1 - x0],
+                   frame[cy0:cy1, cx0:cx1])
     return frame
 
-def gen_frames_for_camera(machine_id):
-    camera_config = next((c for c in cameras_config if c['machine_id'] == machine_id), None)
-    if not camera_config:
-        return
-        
-    rtsp_url = camera_config['rtsp_url']
+def camera_loop(camera_config):
+    # Thread per camera: cattura, rilevamento, log e codifica JPEG avvengono
+    # qui una sola volta, indipendentemente dal numero di client web
+    machine_id = camera_config['machine_id']
+    # Substream a bassa risoluzione se disponibile: decodifica molto più
+    # leggera, ma le coordinate delle regioni vanno date su quel flusso
+    rtsp_url = camera_config.get('substream_rtsp_url') or camera_config['rtsp_url']
     led_regions = [LEDRegion(r['name'], r['x'], r['y'], r['width'], r['height'], machine_id) 
                    for r in camera_config['led_regions']]
     
-    detector = cameras_data[machine_id]['detector']
-    log_file = cameras_data[machine_id]['log_file']
+    camera_data = cameras_data[machine_id]
+    detector = camera_data['detector']
+    log_file = camera_data['log_file']
+    status = camera_data['status']
+    history = camera_data['history']
+    jpeg_cond = camera_data['jpeg_cond']
+    notifier = camera_data['notifier']
+    # Chiavi di stato e metodi usati nel ciclo risolti una volta sola
+    status_keys = {region.name: f"{machine_id}_{region.name}" for region in led_regions}
+    summary_key = status_keys[led_regions[0].name] if led_regions else None
+    write_log = log_file.write
+    append_history = history.append
+    enqueue_notification = notification_queue.put_nowait
     
-    with suppress_stderr():
-        cap = cv2.VideoCapture(rtsp_url)
-    if not cap.isOpened():
+    rtsp_config = RTSPConfig(url=rtsp_url, fps=SETTINGS['monitoring_fps'],
+                             hwaccel=camera_config.get('hwaccel', 'none'))
+    while not stop_event.is_set():
+        if rtsp_manager.add_stream(machine_id, rtsp_config):
+            break
         print(f"Errore: impossibile aprire il flusso RTSP {rtsp_url} per {machine_id}")
-        return
+        stop_event.wait(SETTINGS['reconnect_delay'])
         
-    while True:
-        success, frame = cap.read()
-        if not success:
-            time.sleep(0.1)
+    # Il client RTSP converte e pubblica i frame già alla frequenza di
+    # monitoraggio (fps della RTSPConfig): si elabora ogni frame nuovo
+    seq = 0
+    last_signature = None
+    last_encode = 0.0
+    overlay_frame = None  # buffer riusato per l'overlay, niente allocazioni per frame
+    while not stop_event.is_set():
+        new_seq, frame = rtsp_manager.wait_for_frame(machine_id, seq)
+        if frame is None or new_seq == seq:
             continue
+        seq = new_seq
 
+        now = time.monotonic()
         detections = detector.detect_multiple_leds(frame, led_regions)
-        frame = draw_overlay(frame, detections)
 
+        # Orario formattato una sola volta per frame, solo se c'è un cambio
+        time_str = None
         for det in detections:
-            key = f"{machine_id}_{det.region.name}"
+            # Le regioni in errore mancano dalle rilevazioni: chiave per nome
+            key = status_keys[det.region.name]
             current = det.status.value
-            old = cameras_data[machine_id]['status'].get(key)
+            old = status.get(key)
             
             if old != current:
-                cameras_data[machine_id]['status'][key] = current
+                status[key] = current
+                if key == summary_key:
+                    camera_data['summary_color'] = STATE_COLOR_MAP.get(current, "#000000")
                 
-                timestamp = datetime.now()
-                time_str = timestamp.strftime("%H:%M:%S")
+                if time_str is None:
+                    time_str = current_hms()
                 
-                log_line = f"{machine_id};{old if old else 'None'};{current};{time_str}\n"
-                log_file.write(log_line)
-                log_file.flush()
+                # Messaggio costruito una volta sola per log, console e storico
+                message = f"{machine_id};{old if old else 'None'};{current};{time_str}"
+                write_log(message + "\n")
                 
-                print(log_line.strip())
+                logger.info(message)
 
-                cameras_data[machine_id]['history'].append({
+                entry = {
                     "time": time_str,
-                    "message": log_line.strip(),
+                    "message": message,
                     "success": None
-                })
-                if len(cameras_data[machine_id]['history']) > 10:
-                    cameras_data[machine_id]['history'].pop(0)
+                }
+                append_history(entry)
+
+                # Il primo stato rilevato all'avvio non è un cambio da notificare
+                if notifier is not None and old is not None:
+                    try:
+                        enqueue_notification((notifier, machine_id, det.region.name,
+                                              old, current, entry))
+                    except queue.Full:
+                        logger.warning(f"Coda notifiche piena, notifica scartata: {machine_id} {det.region.name}")
+                        entry['success'] = False
+
+        # Nessun client collegato allo stream: niente overlay né codifica,
+        # il primo client che arriva riceve un JPEG nuovo al frame successivo
+        if not camera_data['viewers']:
+            last_signature = None
+            continue
+
+        # Stati e luminosità dei LED invariati: niente nuovo JPEG né pubblicazione,
+        # i client restano sull'ultimo ricevuto fino al refresh periodico
+        signature = tuple((det.status, int(det.brightness) >> JPEG_BRIGHTNESS_SHIFT)
+                          for det in detections)
+        if signature != last_signature or now - last_encode >= JPEG_REFRESH_INTERVAL:
+            # Il frame è condiviso dal client RTSP: l'overlay va su una copia
+            if overlay_frame is None or overlay_frame.shape != frame.shape:
+                overlay_frame = np.empty_like(frame)
+            np.copyto(overlay_frame, frame)
+            draw_overlay(overlay_frame, detections)
+            ret, buffer = cv2.imencode('.jpg', overlay_frame, JPEG_PARAMS)
+            if not ret:
+                continue
+            jpeg = buffer.tobytes()
+            part_header = MJPEG_PART_HEADER % len(jpeg)
+            last_signature = signature
+            last_encode = now
+
+            with jpeg_cond:
+                camera_data['jpeg'] = (part_header, jpeg)
+                camera_data['jpeg_seq'] += 1
+                jpeg_cond.notify_all()
+
+def start_camera_threads():
+    threading.Thread(target=notification_worker, daemon=True).start()
+    for camera in cameras_config:
+        thread = threading.Thread(target=camera_loop, args=(camera,), daemon=True)
+        thread.start()
+        camera_threads.append(thread)
 
-        ret, buffer = cv2.imencode('.jpg', frame)
-        frame_bytes = buffer.tobytes()
+def gen_frames_for_camera(machine_id):
+    # Ogni client legge l'ultimo JPEG pubblicato dal thread della camera
+    camera_data = cameras_data[machine_id]
+    jpeg_cond = camera_data['jpeg_cond']
+    with jpeg_cond:
+        camera_data['viewers'] += 1
+        # Il JPEG pubblicato può risalire a prima che lo stream restasse senza client
+        seq = camera_data['jpeg_seq']
+    try:
+        while not stop_event.is_set():
+            with jpeg_cond:
+                jpeg_cond.wait_for(lambda: camera_data['jpeg_seq'] != seq or stop_event.is_set(), 1.0)
+                new_seq = camera_data['jpeg_seq']
+                part = camera_data['jpeg']
+            if part is None or new_seq == seq:
+                continue
+            seq = new_seq
+            part_header, jpeg = part
+
+            # Header, payload e terminatore come chunk separati: nessuna
+            # concatenazione (e copia) del JPEG per ogni frame
+            yield part_header
+            yield jpeg
+            yield b'\r\n'
+    finally:
+        # Client disconnesso (GeneratorExit alla chiusura della risposta)
+        with jpeg_cond:
+            camera_data['viewers'] -= 1
 
-        yield (b'--frame\r\n'
-               b'Content-Type: image/jpeg\r\n\r\n' + frame_bytes + b'\r\n')
+def json_response(data):
+    # Serializzazione JSON con orjson (C) al posto di jsonify
+    return Response(orjson.dumps(data), mimetype='application/json')
 
 @app.route('/')
 def index():
@@ -219,72 +567,24 @@ def video_feed(machine_id):
 def api_notifications(machine_id):
     if machine_id not in cameras_data:
         abort(404, "Camera non trovata")
-    return jsonify(cameras_data[machine_id]['history'])
+    return json_response(list(cameras_data[machine_id]['history']))
 
 @app.route('/camera_status')
 def camera_status():
-    html = f"""
-    <html>
-      <head>
-        <title>Stato Camere</title>
-        <meta http-equiv="refresh" content="15">
-        <style>
-          body {{
-            margin: 0;
-            padding: 20px;
-            font-family: Arial, sans-serif;
-            background-color: #222;
-            color: white;
-          }}
-          .grid-container {{
-            display: grid;
-            grid-template-columns: repeat(10, 1fr);
-            grid-template-rows: repeat(6, 1fr);
-            gap: 10px;
-            height: 90vh;
-          }}
-          .cell {{
-            border: 2px solid #444;
-            background-color: #111;
-            display: flex;
-            justify-content: center;
-            align-items: center;
-            font-size: 2vw;
-            font-weight: bold;
-            text-decoration: none;
-            cursor: pointer;
-            transition: all 0.3s;
-          }}
-          .cell:hover {{
-            background-color: #333;
-            transform: scale(1.05);
-          }}
-        </style>
-      </head>
-      <body>
-        <h1>Stato Camere - Griglia di Monitoraggio</h1>
-        <div class="grid-container">
-    """
-    
-    for i in range(60):
-        if i < len(cameras_config):
-            camera = cameras_config[i]
-            machine_id = camera['machine_id']
-            
-            first_region_key = f"{machine_id}_{camera['led_regions'][0]['name']}"
-            last_state = cameras_data[machine_id]['status'].get(first_region_key, 'off').lower()
-            color = STATE_COLOR_MAP.get(last_state, "#000000")
-            
-            html += f'<a href="/camera/{machine_id}" class="cell" style="color: {color};">{machine_id}</a>'
-        else:
-            html += '<div class="cell"></div>'
+    cells = []
+    for camera in cameras_config[:STATUS_GRID_CELLS]:
+        machine_id = camera['machine_id']
+        cells.append((machine_id, cameras_data[machine_id]['summary_color']))
     
-    html += """
-        </div>
-      </body>
-    </html>
-    """
-    return html
+    # La pagina si ricarica ogni 15 s: se i colori non sono cambiati il
+    # browser riceve un 304 senza render del template
+    etag = hashlib.blake2b(repr(cells).encode(), digest_size=8).hexdigest()
+    if etag in request.if_none_match:
+        return Response(status=304, headers={'ETag': f'"{etag}"'})
+    response = Response(render_template('camera_status.html', cells=cells,
+                                        empty_cells=STATUS_GRID_CELLS - len(cells)))
+    response.set_etag(etag)
+    return response
 
 @app.route('/logs')
 def list_logs():
@@ -313,7 +613,10 @@ def download_log(filename):
     if '..' in filename or filename.startswith('/'):
         abort(400, "Nome file non valido")
     try:
-        return send_from_directory(LOG_DIR, filename, as_attachment=True)
+        # Richieste condizionali e range con ETag: i download ripetuti
+        # ricevono 304 e il file viene inviato con sendfile dal server
+        return send_from_directory(LOG_DIR, filename, as_attachment=True,
+                                   conditional=True, etag=True, max_age=LOG_DOWNLOAD_MAX_AGE)
     except FileNotFoundError:
         abort(404, "File non trovato")
 
@@ -326,30 +629,42 @@ def operator_status(operator_name):
     return render_template('operator_status.html', operator=operator_name, cameras=filtered_cameras, cameras_data=cameras_data)
 
 def run_flask():
-    app.run(host='0.0.0.0', port=8080, debug=False, use_reloader=False)
+    web_settings = SETTINGS['web_interface']
+    serve(app, host='0.0.0.0', port=8080, threads=web_settings['threads'],
+          channel_timeout=web_settings['channel_timeout'])
 
 def main():
+    log_listener = setup_logging()
     load_cameras_config()
     
     if not cameras_config:
         print("Nessuna camera configurata, uscita...")
         return
     
+    # Il parallelismo è già dato dai thread per camera (OpenCV rilascia il
+    # GIL): il pool interno di OpenCV su ROI piccole aggiunge solo contesa
+    cv2.setNumThreads(1)
+    start_camera_threads()
+    threading.Thread(target=log_compression_loop, daemon=True).start()
+
     flask_thread = threading.Thread(target=run_flask, daemon=True)
     flask_thread.start()
     print("Web interface avviata all'indirizzo http://0.0.0.0:8080")
 
     try:
-        while True:
-            time.sleep(1)
+        while not stop_event.wait(1):
+            pass
+        print("\nSegnale di arresto ricevuto, chiudo...")
     except KeyboardInterrupt:
         print("Interruzione ricevuta, chiudo...")
     finally:
-        for machine_id in cameras_data:
-            log_file = cameras_data[machine_id]['log_file']
-            if log_file and not log_file.closed:
-                log_file.close()
+        stop_event.set()
+        rtsp_manager.stop_all()
+        for thread in camera_threads:
+            thread.join(timeout=5)
+        close_logs()
         print("File di log chiusi")
+        log_listener.stop()
 
 if __name__ == '__main__':
     main()
@@ -15,7 +15,7 @@ def send_slack_notification(webhook_url, title, message, metadata=None):
 
     try:
         response = requests.post(webhook_url, json=payload, headers=headers, timeout=10)
-        if response.status_code == 200:
+        if 200 <= response.status_code < 300:
             print("Notifica inviata con successo")
             return True
         else:
@@ -19,19 +19,121 @@ class LEDStatus(Enum):
     FLASHING_YELLOW = "flashing_yellow" 
     FLASHING_RED = "flashing_red"
 
-@dataclass
+# Codici interi degli stati, usati nel ring buffer della storia
+STATUSES = tuple(LEDStatus)
+STATUS_CODES = {status: code for code, status in enumerate(STATUSES)}
+
+# Colori fissi come bitmask sui codici e relativo stato lampeggiante
+FLASHING_BY_CODE = {
+    STATUS_CODES[LEDStatus.GREEN]: LEDStatus.FLASHING_GREEN,
+    STATUS_CODES[LEDStatus.YELLOW]: LEDStatus.FLASHING_YELLOW,
+    STATUS_CODES[LEDStatus.RED]: LEDStatus.FLASHING_RED,
+}
+SOLID_COLOR_MASK = sum(1 << code for code in FLASHING_BY_CODE)
+
+# HSV color ranges for LED detection, built once as uint8 so that
+# cv2.inRange can use them directly without per-call conversion
+# --- Modifica qui per adattare i range HSV ---
+# Allargati per più tolleranza alle variazioni di luce e fotocamera
+HSV_COLOR_RANGES = {
+    LEDStatus.GREEN: {
+        'lower': np.array([35, 40, 40], dtype=np.uint8),   # prima era 40,50,50
+        'upper': np.array([90, 255, 255], dtype=np.uint8)  # prima era 80,255,255
+    },
+    LEDStatus.YELLOW: {
+        'lower': np.array([15, 70, 70], dtype=np.uint8),   # prima 20,100,100
+        'upper': np.array([40, 255, 255], dtype=np.uint8)  # prima 35,255,255
+    },
+    LEDStatus.RED: {
+        'lower': np.array([0, 80, 60], dtype=np.uint8),    # prima 0,120,70
+        'upper': np.array([15, 255, 255], dtype=np.uint8)  # prima 10,255,255
+    }
+}
+
+# Additional red range (wraps around HSV hue)
+RED_HSV_RANGE_2 = {
+    'lower': np.array([165, 80, 60], dtype=np.uint8),     # prima 170,120,70
+    'upper': np.array([180, 255, 255], dtype=np.uint8)    # invariato
+}
+
+# Gli stessi limiti impilati in un unico array (K, 2, 3):
+# verde, giallo, rosso e seconda fascia del rosso
+HSV_BOUNDS = np.array([[r['lower'], r['upper']] for r in (
+    HSV_COLOR_RANGES[LEDStatus.GREEN],
+    HSV_COLOR_RANGES[LEDStatus.YELLOW],
+    HSV_COLOR_RANGES[LEDStatus.RED],
+    RED_HSV_RANGE_2,
+)], dtype=np.uint8)
+
+def _build_hsv_luts(bounds: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Tabelle per cv2.LUT equivalenti agli inRange su HSV_BOUNDS.
+    La prima assegna a ogni valore di H, S e V il bit di ogni fascia che lo
+    contiene: l'AND dei tre canali dà le fasce che contengono il pixel.
+    La seconda espande quei bit nelle maschere 0/255 verde, giallo, rosso.
+    """
+    range_lut = np.zeros((1, 256, 3), dtype=np.uint8)
+    for bit, (lower, upper) in enumerate(bounds.astype(np.int32)):
+        for channel in range(3):
+            range_lut[0, lower[channel]:upper[channel] + 1, channel] |= 1 << bit
+    values = np.arange(256)
+    # Bit 0 verde, bit 1 giallo, bit 2 e 3 le due fasce del rosso
+    mask_lut = np.stack([(values & bits) != 0 for bits in (0b0001, 0b0010, 0b1100)], axis=-1)
+    return range_lut, (mask_lut * 255).astype(np.uint8).reshape(1, 256, 3)
+
+HSV_RANGE_LUT, HSV_MASK_LUT = _build_hsv_luts(HSV_BOUNDS)
+
+# Stato corrispondente a ogni canale delle maschere di range_masks
+MASK_STATUSES = (LEDStatus.GREEN, LEDStatus.YELLOW, LEDStatus.RED)
+
+# Lato massimo (in pixel campionati) della ROI usata per il controllo rapido
+# di LED spento: le ROI più grandi vengono sottocampionate
+DARK_CHECK_SIDE = 32
+
+# Blur a media semplice 3x3 dopo la conversione HSV: sulle ROI piccole dei
+# LED basta a ridurre il rumore, la pulizia vera la fa la morfologia
+BLUR_KERNEL_SIZE = (3, 3)
+
+# Oltre questo rapporto tra area del riquadro comune e area delle ROI accese,
+# detect_multiple_leds converte le ROI una per una invece del riquadro
+UNION_AREA_FACTOR = 2
+
+# Scarto massimo di media e deviazione standard per canale BGR entro cui
+# una ROI accesa è considerata invariata e se ne riusa la classificazione
+ROI_SIGNATURE_TOLERANCE = 1.0
+
+# Colori BGR dell'overlay per ogni stato
+STATUS_BGR_COLORS = {
+    LEDStatus.OFF: (128, 128, 128),
+    LEDStatus.GREEN: (0, 255, 0),
+    LEDStatus.YELLOW: (0, 255, 255),
+    LEDStatus.RED: (0, 0, 255),
+    LEDStatus.FLASHING_GREEN: (0, 128, 0),
+    LEDStatus.FLASHING_YELLOW: (0, 128, 255),
+    LEDStatus.FLASHING_RED: (0, 0, 128)
+}
+
+@dataclass(frozen=True)
 class LEDRegion:
     """Defines a LED monitoring region"""
+    # __slots__ scritti a mano (dataclass(slots=True) richiede Python 3.10);
+    # x1/y1 sono i bordi destro e inferiore, calcolati una volta sola
+    __slots__ = ('name', 'x', 'y', 'width', 'height', 'machine_id', 'x1', 'y1')
     name: str
     x: int
     y: int
     width: int
     height: int
     machine_id: str
+    
+    def __post_init__(self):
+        object.__setattr__(self, 'x1', self.x + self.width)
+        object.__setattr__(self, 'y1', self.y + self.height)
 
 @dataclass
 class LEDDetection:
     """LED detection result"""
+    __slots__ = ('region', 'status', 'confidence', 'timestamp', 'brightness')
     region: LEDRegion
     status: LEDStatus
     confidence: float
@@ -44,32 +146,17 @@ class LEDDetector:
     Uses HSV color space detection and temporal analysis for flashing detection
     """
     
-    def __init__(self):
+    def __init__(self, use_opencl: bool = False):
         self.logger = logging.getLogger(__name__)
         
-        # HSV color ranges for LED detection
-        # --- Modifica qui per adattare i range HSV ---
-        # Allargati per più tolleranza alle variazioni di luce e fotocamera
-        self.color_ranges = {
-            LEDStatus.GREEN: {
-                'lower': np.array([35, 40, 40]),   # prima era 40,50,50
-                'upper': np.array([90, 255, 255])  # prima era 80,255,255
-            },
-            LEDStatus.YELLOW: {
-                'lower': np.array([15, 70, 70]),   # prima 20,100,100
-                'upper': np.array([40, 255, 255])  # prima 35,255,255
-            },
-            LEDStatus.RED: {
-                'lower': np.array([0, 80, 60]),    # prima 0,120,70
-                'upper': np.array([15, 255, 255])  # prima 10,255,255
-            }
-        }
+        # Conversione HSV e blur via OpenCL (T-API), solo se disponibile
+        self.use_opencl = use_opencl and cv2.ocl.haveOpenCL()
+        if self.use_opencl:
+            cv2.ocl.setUseOpenCL(True)
         
-        # Additional red range (wraps around HSV hue)
-        self.red_range_2 = {
-            'lower': np.array([165, 80, 60]),     # prima 170,120,70
-            'upper': np.array([180, 255, 255])    # invariato
-        }
+        # Lookup delle fasce HSV (vedi HSV_COLOR_RANGES e _build_hsv_luts)
+        self.hsv_range_lut = HSV_RANGE_LUT
+        self.hsv_mask_lut = HSV_MASK_LUT
         
         # Threshold di luminosità sotto cui LED è considerato OFF
         # Aumenta o diminuisci per stabilità sotto diverse condizioni di luce
@@ -77,71 +164,75 @@ class LEDDetector:
         
         # Temporal tracking for flashing detection
         self.status_history = {}
+        self.history_count = {}
         self.history_length = 10  # frames to keep for flashing detection
         self.flashing_threshold = 3  # minimum changes to consider flashing
         
+        # Ultima classificazione delle ROI accese con la firma BGR di riferimento:
+        # history_key -> (firma, stato, confidence, luminosità)
+        self.roi_cache = {}
+        
         # Morphological operations kernels
-        self.kernel_small = np.ones((3,3), np.uint8)
-        self.kernel_medium = np.ones((5,5), np.uint8)
+        self.kernel_small = cv2.getStructuringElement(cv2.MORPH_RECT, (3, 3))
+        self.kernel_medium = cv2.getStructuringElement(cv2.MORPH_RECT, (5, 5))
+        self.kernel_large = cv2.getStructuringElement(cv2.MORPH_RECT, (7, 7))  # dilatazione 3x3 + 5x5
         
     def preprocess_frame(self, frame: np.ndarray) -> np.ndarray:
         """
         Preprocess frame for LED detection
         Convert to HSV and apply blur to reduce noise
         """
+        if self.use_opencl:
+            hsv = cv2.cvtColor(cv2.UMat(frame), cv2.COLOR_BGR2HSV)
+            return cv2.blur(hsv, BLUR_KERNEL_SIZE).get()
         hsv = cv2.cvtColor(frame, cv2.COLOR_BGR2HSV)
-        hsv_blurred = cv2.GaussianBlur(hsv, (5, 5), 0)
+        hsv_blurred = cv2.blur(hsv, BLUR_KERNEL_SIZE)
         return hsv_blurred
     
-    def detect_led_color(self, roi_hsv: np.ndarray) -> Tuple[LEDStatus, float, float]:
+    def range_masks(self, hsv: np.ndarray) -> np.ndarray:
+        """
+        Maschere 0/255 verde, giallo e rosso come canali di un'unica immagine.
+        Tutte le fasce HSV (rosso doppio per il wrapping della hue) sono
+        classificate con due lookup invece di un inRange per fascia.
+        """
+        h_bits, s_bits, v_bits = cv2.split(cv2.LUT(hsv, self.hsv_range_lut))
+        range_bits = cv2.bitwise_and(cv2.bitwise_and(h_bits, s_bits), v_bits)
+        return cv2.LUT(cv2.merge((range_bits, range_bits, range_bits)), self.hsv_mask_lut)
+    
+    def detect_led_color(self, roi_hsv: np.ndarray,
+                         roi_masks: Optional[np.ndarray] = None) -> Tuple[LEDStatus, float, float]:
         """
         Detect LED color in ROI using HSV color thresholds.
+        roi_masks: maschere di range_masks già calcolate per la ROI, se disponibili.
         Returns: (status, confidence, brightness)
         """
-        brightness = np.mean(roi_hsv[:, :, 2])  # brightness channel
+        brightness = cv2.mean(roi_hsv)[2]  # brightness channel, senza copie intermedie
 
         if brightness < self.brightness_threshold:
             # LED troppo scuro, considerato spento
             return LEDStatus.OFF, 1.0, brightness
         
-        # Crea maschere per ogni colore
-        masks = {}
-
-        # Verde - usa il range HSV ampliato (puoi modificare qui)
-        masks[LEDStatus.GREEN] = cv2.inRange(roi_hsv, 
-                                             self.color_ranges[LEDStatus.GREEN]['lower'],
-                                             self.color_ranges[LEDStatus.GREEN]['upper'])
-        
-        # Giallo
-        masks[LEDStatus.YELLOW] = cv2.inRange(roi_hsv,
-                                             self.color_ranges[LEDStatus.YELLOW]['lower'],
-                                             self.color_ranges[LEDStatus.YELLOW]['upper'])
+        masks = self.range_masks(roi_hsv) if roi_masks is None else roi_masks
         
-        # Rosso - gestisce range doppio per effetto wrapping hue HSV
-        red_mask1 = cv2.inRange(roi_hsv,
-                               self.color_ranges[LEDStatus.RED]['lower'],
-                               self.color_ranges[LEDStatus.RED]['upper'])
-        red_mask2 = cv2.inRange(roi_hsv,
-                               self.red_range_2['lower'],
-                               self.red_range_2['upper'])
-        masks[LEDStatus.RED] = cv2.bitwise_or(red_mask1, red_mask2)
-        
-        # Pulizia maschere con operazioni morfologiche per ridurre rumore
-        for status in masks:
-            masks[status] = cv2.morphologyEx(masks[status], cv2.MORPH_OPEN, self.kernel_small)
-            masks[status] = cv2.morphologyEx(masks[status], cv2.MORPH_CLOSE, self.kernel_medium)
+        # Pulizia maschere con operazioni morfologiche per ridurre rumore:
+        # erosione e dilatazione lavorano canale per canale, quindi una sola
+        # chiamata pulisce tutti i colori con lo stesso risultato.
+        # Apertura 3x3 seguita da chiusura 5x5, con le due dilatazioni
+        # consecutive fuse in una sola 7x7 (stesso risultato, un passaggio in meno)
+        masks = cv2.erode(masks, self.kernel_small)
+        masks = cv2.dilate(masks, self.kernel_large)
+        masks = cv2.erode(masks, self.kernel_medium)
         
         # Calcolo confidence per ogni colore in base al numero di pixel attivi
-        confidences = {}
+        # (le maschere valgono 0 o 255: somma / 255 = pixel attivi)
         total_pixels = roi_hsv.shape[0] * roi_hsv.shape[1]
-        for status, mask in masks.items():
-            non_zero_pixels = cv2.countNonZero(mask)
-            confidence = non_zero_pixels / total_pixels
-            confidences[status] = confidence
+        sums = cv2.sumElems(masks)[:3]
         
-        # Scegli il colore con confidence massima
-        best_status = max(confidences.keys(), key=lambda x: confidences[x])
-        best_confidence = confidences[best_status]
+        # Scegli il colore con confidence massima (a parità vince il primo
+        # nell'ordine verde, giallo, rosso dei canali)
+        best = sums.index(max(sums))
+        best_status = MASK_STATUSES[best]
+        best_confidence = sums[best] / 255 / total_pixels
         
         # Se la confidence più alta è sotto soglia minima, considera LED spento
         if best_confidence < 0.1:
@@ -151,90 +242,207 @@ class LEDDetector:
     
     def update_status_history(self, region_name: str, status: LEDStatus) -> None:
         """
-        Aggiorna la storia degli stati della regione per riconoscere il lampeggio
+        Aggiorna la storia degli stati della regione per riconoscere il lampeggio.
+        La storia è un ring buffer int8 di history_length codici di stato.
         """
-        if region_name not in self.status_history:
-            self.status_history[region_name] = []
-        
-        self.status_history[region_name].append(status)
+        history = self.status_history.get(region_name)
+        if history is None:
+            history = np.full(self.history_length, -1, dtype=np.int8)
+            self.status_history[region_name] = history
+            self.history_count[region_name] = 0
         
-        # Mantieni solo gli ultimi frame definiti da history_length
-        if len(self.status_history[region_name]) > self.history_length:
-            self.status_history[region_name].pop(0)
+        count = self.history_count[region_name]
+        history[count % len(history)] = STATUS_CODES[status]
+        self.history_count[region_name] = count + 1
     
     def detect_flashing(self, region_name: str, current_status: LEDStatus) -> LEDStatus:
         """
         Rileva se un LED è lampeggiante analizzando la storia degli stati
         """
-        if region_name not in self.status_history:
+        history = self.status_history.get(region_name)
+        if history is None:
             return current_status
         
-        history = self.status_history[region_name]
-        
-        if len(history) < self.history_length:
+        count = self.history_count[region_name]
+        if count < len(history):
             return current_status
         
-        changes = 0
-        base_color = None
+        # Riporta il ring buffer in ordine cronologico e conta le transizioni
+        start = count % len(history)
+        ordered = np.concatenate((history[start:], history[:start]))
+        changed = ordered[1:] != ordered[:-1]
+        changes = int(np.count_nonzero(changed))
         
-        for i in range(1, len(history)):
-            if history[i] != history[i-1]:
-                changes += 1
-                if history[i] in [LEDStatus.GREEN, LEDStatus.YELLOW, LEDStatus.RED]:
-                    base_color = history[i]
+        if changes < self.flashing_threshold:
+            return current_status
         
-        if changes >= self.flashing_threshold and base_color:
-            if base_color == LEDStatus.GREEN:
-                return LEDStatus.FLASHING_GREEN
-            elif base_color == LEDStatus.YELLOW:
-                return LEDStatus.FLASHING_YELLOW
-            elif base_color == LEDStatus.RED:
-                return LEDStatus.FLASHING_RED
+        # Colore di base: l'ultimo colore in cui il LED è entrato
+        for code in ordered[1:][changed][::-1].tolist():
+            if (1 << code) & SOLID_COLOR_MASK:
+                return FLASHING_BY_CODE[code]
         
         return current_status
     
+    def dark_roi_brightness(self, roi: np.ndarray) -> Optional[float]:
+        """
+        Controllo rapido sulla ROI BGR, prima della conversione HSV.
+        Il canale V di HSV è il massimo tra B, G e R: se la sua media è sotto
+        soglia il LED è spento e si restituisce la luminosità, altrimenti None.
+        """
+        # Sulle ROI grandi basta un pixel ogni `step` per lato per la media
+        step = max(1, max(roi.shape[:2]) // DARK_CHECK_SIDE)
+        if step > 1:
+            roi = roi[::step, ::step]
+        blue, green, red = cv2.split(roi)
+        brightness = cv2.mean(cv2.max(cv2.max(blue, green), red))[0]
+        if brightness < self.brightness_threshold:
+            return brightness
+        return None
+    
     def detect_led_in_region(self, frame: np.ndarray, region: LEDRegion) -> LEDDetection:
         """
         Rileva lo stato del LED in una regione specifica
         """
-        roi = frame[region.y:region.y+region.height, region.x:region.x+region.width]
-        
+        roi = frame[region.y:region.y1, region.x:region.x1]
         if roi.size == 0:
+            return self._detect_in_hsv_roi(roi, region)
+        
+        brightness = self.dark_roi_brightness(roi)
+        if brightness is not None:
+            return self._build_detection(region, LEDStatus.OFF, 1.0, brightness)
+        
+        return self._detect_in_hsv_roi(self.preprocess_frame(roi), region)
+    
+    @staticmethod
+    def roi_signature(roi: np.ndarray) -> np.ndarray:
+        """
+        Firma economica della ROI BGR: media e deviazione standard per canale
+        """
+        mean, stddev = cv2.meanStdDev(roi)
+        return np.concatenate((mean, stddev)).ravel()
+    
+    def _detect_in_hsv_roi(self, roi_hsv: np.ndarray, region: LEDRegion,
+                           signature: Optional[np.ndarray] = None,
+                           timestamp: Optional[datetime] = None,
+                           roi_masks: Optional[np.ndarray] = None) -> LEDDetection:
+        """
+        Classifica una ROI già convertita in HSV e aggiorna la storia della regione.
+        Con la firma della ROI BGR la classificazione viene memorizzata per i
+        frame successivi.
+        """
+        if roi_hsv.size == 0:
             self.logger.warning(f"Empty ROI for region {region.name}")
             return LEDDetection(
                 region=region,
                 status=LEDStatus.OFF,
                 confidence=0.0,
-                timestamp=datetime.now(),
+                timestamp=timestamp or datetime.now(),
                 brightness=0.0
             )
         
-        roi_hsv = self.preprocess_frame(roi)
-        status, confidence, brightness = self.detect_led_color(roi_hsv)
-        self.update_status_history(region.name, status)
-        final_status = self.detect_flashing(region.name, status)
+        status, confidence, brightness = self.detect_led_color(roi_hsv, roi_masks)
+        if signature is not None:
+            self.roi_cache[f"{region.machine_id}_{region.name}"] = (signature, status, confidence, brightness)
+        return self._build_detection(region, status, confidence, brightness, timestamp)
+    
+    def _build_detection(self, region: LEDRegion, status: LEDStatus,
+                         confidence: float, brightness: float,
+                         timestamp: Optional[datetime] = None) -> LEDDetection:
+        """
+        Aggiorna la storia della regione e costruisce il risultato finale
+        """
+        # Storia per macchina e regione: un detector può servire più camere
+        history_key = f"{region.machine_id}_{region.name}"
+        self.update_status_history(history_key, status)
+        final_status = self.detect_flashing(history_key, status)
         
         return LEDDetection(
             region=region,
             status=final_status,
             confidence=confidence,
-            timestamp=datetime.now(),
+            timestamp=timestamp or datetime.now(),
             brightness=brightness
         )
     
     def detect_multiple_leds(self, frame: np.ndarray, regions: List[LEDRegion]) -> List[LEDDetection]:
         """
-        Rileva lo stato di più LED in più regioni
+        Rileva lo stato di più LED in più regioni.
+        Le regioni spente vengono scartate con un controllo di luminosità sui
+        pixel BGR; per le altre la conversione HSV (e il blur) viene eseguita
+        una sola volta sul riquadro che le contiene tutte, poi ogni ROI è una
+        vista su quel risultato. Le ROI accese con la stessa firma BGR
+        dell'ultima classificazione la riusano senza passare per l'HSV.
         """
-        results = []
+        detections = [None] * len(regions)
+        signatures = [None] * len(regions)
+        lit = []
+        # Un solo timestamp per tutte le rilevazioni dello stesso frame
+        timestamp = datetime.now()
         
-        for region in regions:
+        for i, region in enumerate(regions):
             try:
-                detection = self.detect_led_in_region(frame, region)
-                results.append(detection)
-                self.logger.debug(f"Region {region.name}: {detection.status.value} (conf: {detection.confidence:.2f})")
+                roi = frame[region.y:region.y1, region.x:region.x1]
+                if roi.size == 0:
+                    detections[i] = self._detect_in_hsv_roi(roi, region, timestamp=timestamp)
+                    continue
+                brightness = self.dark_roi_brightness(roi)
+                if brightness is not None:
+                    detections[i] = self._build_detection(region, LEDStatus.OFF, 1.0, brightness,
+                                                          timestamp)
+                    continue
+                signature = self.roi_signature(roi)
+                cached = self.roi_cache.get(f"{region.machine_id}_{region.name}")
+                if cached is not None and np.abs(signature - cached[0]).max() <= ROI_SIGNATURE_TOLERANCE:
+                    # La storia riceve comunque lo stato: il lampeggio resta rilevabile
+                    detections[i] = self._build_detection(region, *cached[1:], timestamp)
+                else:
+                    signatures[i] = signature
+                    lit.append(i)
             except Exception as e:
                 self.logger.error(f"Error detecting LED in region {region.name}: {e}")
+        
+        if lit:
+            frame_h, frame_w = frame.shape[:2]
+            x0 = max(min(regions[i].x for i in lit), 0)
+            y0 = max(min(regions[i].y for i in lit), 0)
+            x1 = min(max(regions[i].x1 for i in lit), frame_w)
+            y1 = min(max(regions[i].y1 for i in lit), frame_h)
+            
+            # Regioni sparse nel frame: il riquadro comune sarebbe quasi tutto
+            # sfondo, conviene convertire solo le singole ROI
+            roi_area = sum(regions[i].width * regions[i].height for i in lit)
+            if (x1 - x0) * (y1 - y0) > UNION_AREA_FACTOR * roi_area:
+                for i in lit:
+                    region = regions[i]
+                    try:
+                        roi = frame[region.y:region.y1, region.x:region.x1]
+                        detections[i] = self._detect_in_hsv_roi(self.preprocess_frame(roi), region,
+                                                                signatures[i], timestamp)
+                    except Exception as e:
+                        self.logger.error(f"Error detecting LED in region {region.name}: {e}")
+                lit = []
+            else:
+                # Anche la classificazione delle fasce HSV avviene una volta
+                # sola sul riquadro; morfologia e conteggi restano per ROI
+                hsv = self.preprocess_frame(frame[y0:y1, x0:x1])
+                masks = self.range_masks(hsv)
+            
+            for i in lit:
+                region = regions[i]
+                try:
+                    rows = slice(max(region.y - y0, 0), max(region.y1 - y0, 0))
+                    cols = slice(max(region.x - x0, 0), max(region.x1 - x0, 0))
+                    detections[i] = self._detect_in_hsv_roi(hsv[rows, cols], region, signatures[i],
+                                                            timestamp, masks[rows, cols])
+                except Exception as e:
+                    self.logger.error(f"Error detecting LED in region {region.name}: {e}")
+        
+        results = [detection for detection in detections if detection is not None]
+        # Logging per regione per frame: formattato solo con il livello DEBUG attivo
+        if self.logger.isEnabledFor(logging.DEBUG):
+            for detection in results:
+                self.logger.debug("Region %s: %s (conf: %.2f)",
+                                  detection.region.name, detection.status.value, detection.confidence)
                 
         return results
     
@@ -243,22 +451,13 @@ class LEDDetector:
         Visualizza le rilevazioni disegnando rettangoli colorati sulle regioni LED
         """
         result_frame = frame.copy()
-        color_map = {
-            LEDStatus.OFF: (128, 128, 128),
-            LEDStatus.GREEN: (0, 255, 0),
-            LEDStatus.YELLOW: (0, 255, 255),
-            LEDStatus.RED: (0, 0, 255),
-            LEDStatus.FLASHING_GREEN: (0, 128, 0),
-            LEDStatus.FLASHING_YELLOW: (0, 128, 255),
-            LEDStatus.FLASHING_RED: (0, 0, 128)
-        }
         
         for detection in detections:
             region = detection.region
             status = detection.status
-            color = color_map.get(status, (255, 255, 255))
+            color = STATUS_BGR_COLORS[status]
             cv2.rectangle(result_frame, (region.x, region.y),
-                          (region.x + region.width, region.y + region.height),
+                          (region.x1, region.y1),
                           color, 2)
             label = f"{region.name}: {status.value}"
             cv2.putText(result_frame, label, (region.x, region.y - 10),
@@ -1,85 +1,212 @@
 import smtplib
+import orjson
 import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
 import logging
 import json
+import queue
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
 from email.mime.text import MIMEText
 from email.mime.multipart import MIMEMultipart
+from collections import deque
+from urllib.parse import urlsplit
 from datetime import datetime
-from typing import Dict, List, Optional
+from typing import Dict, Iterable, List, Optional, Tuple
 from dataclasses import dataclass
 from abc import ABC, abstractmethod
 
-@dataclass
+@dataclass(frozen=True)
 class NotificationConfig:
     """Base notification configuration"""
     enabled: bool = True
     priority_filter: List[str] = None  # None means all priorities
 
+@dataclass(frozen=True)
 class EmailConfig(NotificationConfig):
     smtp_server: str = "smtp.gmail.com"
     smtp_port: int = 587
+    timeout: int = 30
     username: str = ""
     password: str = ""
     recipients: List[str] = None
     use_tls: bool = True
 
+@dataclass(frozen=True)
 class WebhookConfig(NotificationConfig):
     urls: List[str] = None
     timeout: int = 10
     headers: Dict[str, str] = None
 
+@dataclass(frozen=True)
 class TelegramConfig(NotificationConfig):
     bot_token: str = ""
     chat_ids: List[str] = None
 
+# I payload JSON sono serializzati con orjson e inviati come corpo già pronto
+JSON_HEADERS = {'Content-Type': 'application/json'}
+
+# Invii paralleli verso più URL/chat di uno stesso provider
+DELIVERY_WORKERS = 8
+_delivery_executor = ThreadPoolExecutor(max_workers=DELIVERY_WORKERS, thread_name_prefix="delivery")
+
+# Finestra in secondi entro cui una notifica identica (titolo, messaggio e
+# priorità) già inviata con send_notification viene scartata
+DEFAULT_DEDUP_SECONDS = 60.0
+
+# Notifiche non "high" ammesse per ogni RATE_LIMIT_WINDOW secondi
+DEFAULT_RATE_LIMIT = 30
+RATE_LIMIT_WINDOW = 60.0
+
+# Attesa massima in secondi per raccogliere le notifiche asincrone in coda
+# in un solo lotto (una sessione SMTP per tutte le email del lotto)
+BATCH_WAIT = 0.2
+
+# Finestra in secondi entro cui le notifiche uguali (stesso titolo e
+# priorità) inviate con send_notification_async vengono raggruppate
+DEFAULT_DEBOUNCE_SECONDS = 30.0
+
+# Attesa massima in secondi tra due tentativi, sia per il backoff sia per un
+# Retry-After inviato dal server: un 429 non blocca a lungo il thread di invio
+RETRY_MAX_WAIT = 5.0
+
+class _CappedRetry(Retry):
+    def get_backoff_time(self) -> float:
+        return min(super().get_backoff_time(), RETRY_MAX_WAIT)
+
+    def get_retry_after(self, response) -> Optional[float]:
+        retry_after = super().get_retry_after(response)
+        return None if retry_after is None else min(retry_after, RETRY_MAX_WAIT)
+
+def create_session(pool_maxsize: int = 1) -> requests.Session:
+    """
+    Session HTTP con connessioni keep-alive riusate tra un invio e l'altro.
+    Si ritentano solo i POST sicuramente non consegnati: errori di connessione
+    e rate limit (429). Timeout di lettura e risposte 5xx non vengono ritentati,
+    perché la notifica potrebbe essere già arrivata e verrebbe duplicata.
+    """
+    session = requests.Session()
+    retry = _CappedRetry(total=3, connect=3, read=0, status=3, other=0, backoff_factor=1,
+                         status_forcelist=[429], allowed_methods=frozenset(["POST"]),
+                         raise_on_status=False)
+    adapter = HTTPAdapter(pool_connections=pool_maxsize, pool_maxsize=pool_maxsize, max_retries=retry)
+    session.mount("https://", adapter)
+    session.mount("http://", adapter)
+    return session
+
 class NotificationProvider(ABC):
     @abstractmethod
     def send(self, title: str, message: str, priority: str = "medium", metadata: Dict = None) -> bool:
         pass
 
+    def send_batch(self, alerts: List[Tuple[str, str, str, Optional[Dict]]]) -> List[bool]:
+        """Invia un lotto di (titolo, messaggio, priorità, metadata); un esito per notifica"""
+        return [self.send(*alert) for alert in alerts]
+
 class EmailProvider(NotificationProvider):
+    PRIORITY_HEADERS = {"high": "1", "medium": "3", "low": "5"}
+    PRIORITY_COLORS = {"high": "#FF4444", "medium": "#FF8800", "low": "#44AA44"}
+    PRIORITY_LABELS = {"high": "CRITICO", "medium": "ATTENZIONE", "low": "INFORMATIVO"}
+
     def __init__(self, config: EmailConfig):
         self.config = config
         self.logger = logging.getLogger(__name__)
-
-    def send(self, title: str, message: str, priority: str = "medium", metadata: Dict = None) -> bool:
-        if not self.config.enabled:
-            return True
-
-        if self.config.priority_filter and priority not in self.config.priority_filter:
-            return True
-
+        # Connessione SMTP autenticata riusata tra gli invii (TLS e login una volta sola)
+        self._smtp: Optional[smtplib.SMTP] = None
+        self._smtp_lock = threading.Lock()
+        self._body_prefixes = {}  # intestazione HTML già formattata per priorità
+
+    def _connect(self) -> smtplib.SMTP:
+        self._close()
+        server = smtplib.SMTP(self.config.smtp_server, self.config.smtp_port, timeout=self.config.timeout)
         try:
-            msg = MIMEMultipart()
-            msg['From'] = self.config.username
-            msg['To'] = ", ".join(self.config.recipients)
-            msg['Subject'] = title
-            priority_headers = {"high": "1", "medium": "3", "low": "5"}
-            msg['X-Priority'] = priority_headers.get(priority, "3")
-            body = self._create_email_body(message, priority, metadata)
-            msg.attach(MIMEText(body, 'html'))
-
-            server = smtplib.SMTP(self.config.smtp_server, self.config.smtp_port)
             if self.config.use_tls:
                 server.starttls()
             server.login(self.config.username, self.config.password)
-            text = msg.as_string()
+        except BaseException:
+            # TLS o login falliti: il socket appena aperto non va lasciato aperto
+            server.close()
+            raise
+        self._smtp = server
+        return server
+
+    def _ensure(self) -> smtplib.SMTP:
+        # Connessione riusata solo se risponde ancora al NOOP, altrimenti se ne apre una nuova
+        if self._smtp is not None:
+            try:
+                if self._smtp.noop()[0] == 250:
+                    return self._smtp
+            except (smtplib.SMTPException, OSError):
+                pass
+        return self._connect()
+
+    def _close(self):
+        if self._smtp is not None:
+            try:
+                self._smtp.quit()
+            except (smtplib.SMTPException, OSError):
+                pass
+            self._smtp = None
+
+    def close(self):
+        """Chiude la connessione SMTP mantenuta aperta tra gli invii"""
+        with self._smtp_lock:
+            self._close()
+
+    def _sendmail(self, text: str):
+        # Chiamato con _smtp_lock acquisito
+        server = self._ensure()
+        try:
             server.sendmail(self.config.username, self.config.recipients, text)
-            server.quit()
-
-            self.logger.info(f"Email notification sent: {title}")
-            return True
+        except smtplib.SMTPServerDisconnected:
+            # Il server ha chiuso la connessione inattiva: nuova connessione e un solo nuovo tentativo
+            self._connect().sendmail(self.config.username, self.config.recipients, text)
+
+    def _create_message(self, title: str, message: str, priority: str, metadata: Dict = None) -> str:
+        msg = MIMEMultipart()
+        msg['From'] = self.config.username
+        msg['To'] = ", ".join(self.config.recipients)
+        msg['Subject'] = title
+        msg['X-Priority'] = self.PRIORITY_HEADERS.get(priority, "3")
+        body = self._create_email_body(message, priority, metadata)
+        msg.attach(MIMEText(body, 'html'))
+        return msg.as_string()
 
-        except Exception as e:
-            self.logger.error(f"Failed to send email notification: {e}")
-            return False
+    def send(self, title: str, message: str, priority: str = "medium", metadata: Dict = None) -> bool:
+        return self.send_batch([(title, message, priority, metadata)])[0]
 
-    def _create_email_body(self, message: str, priority: str, metadata: Dict = None) -> str:
-        priority_colors = {"high": "#FF4444", "medium": "#FF8800", "low": "#44AA44"}
-        priority_labels = {"high": "CRITICO", "medium": "ATTENZIONE", "low": "INFORMATIVO"}
-        color = priority_colors.get(priority, "#666666")
-        label = priority_labels.get(priority, priority.upper())
-        html = f"""
+    def send_batch(self, alerts: List[Tuple[str, str, str, Optional[Dict]]]) -> List[bool]:
+        results = [True] * len(alerts)
+        if not self.config.enabled:
+            return results
+
+        priority_filter = self.config.priority_filter
+        pending = [i for i, alert in enumerate(alerts) if not priority_filter or alert[2] in priority_filter]
+
+        # Tutte le email del lotto passano sulla stessa sessione SMTP, una dopo l'altra
+        with self._smtp_lock:
+            for n, i in enumerate(pending):
+                title, message, priority, metadata = alerts[i]
+                try:
+                    self._sendmail(self._create_message(title, message, priority, metadata))
+                    self.logger.info(f"Email notification sent: {title}")
+                except Exception as e:
+                    self.logger.error(f"Failed to send email notification: {e}")
+                    results[i] = False
+                    if self._smtp is None:
+                        # Connessione al server non riuscita: le altre email del lotto falliscono
+                        # subito invece di attendere ognuna il timeout con il lock acquisito
+                        for j in pending[n + 1:]:
+                            results[j] = False
+                        self.logger.error(f"SMTP server unreachable, {len(pending) - n - 1} "
+                                          f"queued email notifications not sent")
+                        break
+        return results
+
+    # Parti statiche del corpo HTML, assemblate con join ad ogni invio
+    EMAIL_BODY_PREFIX = """
         <html>
         <body style="font-family: Arial, sans-serif;">
             <div style="border-left: 4px solid {color}; padding: 10px; margin: 10px 0;">
@@ -87,18 +214,13 @@ class EmailProvider(NotificationProvider):
                     🚨 ALERT {label}
                 </h2>
                 <p style="font-size: 16px; margin: 10px 0;">
-                    {message}
+                    """
+    EMAIL_BODY_MIDDLE = """
                 </p>
                 <hr style="border: none; border-top: 1px solid #eee; margin: 20px 0;">
                 <p style="font-size: 12px; color: #666;">
-                    <strong>Timestamp:</strong> {datetime.now().strftime('%d/%m/%Y %H:%M:%S')}<br>
-        """
-        if metadata:
-            html += "<strong>Dettagli:</strong><br>"
-            for key, value in metadata.items():
-                if key != 'timestamp':
-                    html += f"&nbsp;&nbsp;• {key}: {value}<br>"
-        html += """
+                    <strong>Timestamp:</strong> """
+    EMAIL_BODY_SUFFIX = """
                 </p>
                 <p style="font-size: 12px; color: #888; font-style: italic;">
                     Questo messaggio è stato generato automaticamente dal sistema di monitoraggio Shima.
@@ -107,12 +229,30 @@ class EmailProvider(NotificationProvider):
         </body>
         </html>
         """
-        return html
+
+    def _body_prefix(self, priority: str) -> str:
+        prefix = self._body_prefixes.get(priority)
+        if prefix is None:
+            prefix = self._body_prefixes[priority] = self.EMAIL_BODY_PREFIX.format(
+                color=self.PRIORITY_COLORS.get(priority, "#666666"),
+                label=self.PRIORITY_LABELS.get(priority, priority.upper()))
+        return prefix
+
+    def _create_email_body(self, message: str, priority: str, metadata: Dict = None) -> str:
+        parts = [self._body_prefix(priority), message, self.EMAIL_BODY_MIDDLE,
+                 datetime.now().strftime('%d/%m/%Y %H:%M:%S'), "<br>\n        "]
+        if metadata:
+            parts.append("<strong>Dettagli:</strong><br>")
+            parts.extend(f"&nbsp;&nbsp;• {key}: {value}<br>"
+                         for key, value in metadata.items() if key != 'timestamp')
+        parts.append(self.EMAIL_BODY_SUFFIX)
+        return ''.join(parts)
 
 class WebhookProvider(NotificationProvider):
     def __init__(self, config: WebhookConfig):
         self.config = config
         self.logger = logging.getLogger(__name__)
+        self.session = create_session(pool_maxsize=16)
 
     def send(self, title: str, message: str, priority: str = "medium", metadata: Dict = None) -> bool:
         if not self.config.enabled or not self.config.urls:
@@ -131,20 +271,16 @@ class WebhookProvider(NotificationProvider):
         if metadata:
             payload["metadata"] = metadata
 
-        success_count = 0
-        for url in self.config.urls:
-            try:
-                headers = {'Content-Type': 'application/json'}
-                if self.config.headers:
-                    headers.update(self.config.headers)
-                response = requests.post(url, json=payload, headers=headers, timeout=self.config.timeout)
-                if response.status_code == 200:
-                    success_count += 1
-                    self.logger.debug(f"Webhook notification sent to {url}")
-                else:
-                    self.logger.warning(f"Webhook notification failed for {url}: {response.status_code}")
-            except Exception as e:
-                self.logger.error(f"Failed to send webhook notification to {url}: {e}")
+        headers = dict(JSON_HEADERS)
+        if self.config.headers:
+            headers.update(self.config.headers)
+        # Serializzato una volta sola per tutti gli endpoint
+        body = orjson.dumps(payload)
+
+        # Un endpoint lento non ritarda gli altri
+        futures = [_delivery_executor.submit(self._post_one, url, body, headers)
+                   for url in self.config.urls]
+        success_count = sum(future.result() for future in futures)
 
         success = success_count > 0
         if success:
@@ -152,11 +288,26 @@ class WebhookProvider(NotificationProvider):
 
         return success
 
+    def _post_one(self, url: str, body: bytes, headers: Dict[str, str]) -> bool:
+        try:
+            response = self.session.post(url, data=body, headers=headers, timeout=self.config.timeout)
+            if 200 <= response.status_code < 300:
+                self.logger.debug("Webhook notification sent to %s", url)
+                return True
+            self.logger.warning(f"Webhook notification failed for {url}: {response.status_code}")
+        except Exception as e:
+            self.logger.error(f"Failed to send webhook notification to {url}: {e}")
+        return False
+
 class TelegramProvider(NotificationProvider):
+    PRIORITY_EMOJIS = {"high": "🔴", "medium": "🟡", "low": "🟢"}
+
     def __init__(self, config: TelegramConfig):
         self.config = config
         self.logger = logging.getLogger(__name__)
         self.base_url = f"https://api.telegram.org/bot{self.config.bot_token}"
+        self.send_url = f"{self.base_url}/sendMessage"
+        self.session = create_session(pool_maxsize=DELIVERY_WORKERS)
 
     def send(self, title: str, message: str, priority: str = "medium", metadata: Dict = None) -> bool:
         if not self.config.enabled or not self.config.bot_token or not self.config.chat_ids:
@@ -165,28 +316,16 @@ class TelegramProvider(NotificationProvider):
         if self.config.priority_filter and priority not in self.config.priority_filter:
             return True
 
-        emoji_map = {"high": "🔴", "medium": "🟡", "low": "🟢"}
-        emoji = emoji_map.get(priority, "ℹ️")
-        formatted_message = f"{emoji} *{title}*\n\n{message}"
-
+        emoji = self.PRIORITY_EMOJIS.get(priority, "ℹ️")
+        parts = [f"{emoji} *{title}*\n\n{message}"]
         if metadata:
-            formatted_message += "\n\n*Dettagli:*"
-            for key, value in metadata.items():
-                if key != 'timestamp':
-                    formatted_message += f"\n• {key}: `{value}`"
+            parts.append("\n\n*Dettagli:*")
+            parts.extend(f"\n• {key}: `{value}`" for key, value in metadata.items() if key != 'timestamp')
+        formatted_message = ''.join(parts)
 
-        success_count = 0
-        for chat_id in self.config.chat_ids:
-            try:
-                payload = {'chat_id': chat_id, 'text': formatted_message, 'parse_mode': 'Markdown'}
-                response = requests.post(f"{self.base_url}/sendMessage", json=payload, timeout=10)
-                if response.status_code == 200:
-                    success_count += 1
-                    self.logger.debug(f"Telegram notification sent to {chat_id}")
-                else:
-                    self.logger.warning(f"Telegram notification failed for {chat_id}: {response.status_code}")
-            except Exception as e:
-                self.logger.error(f"Failed to send Telegram notification to {chat_id}: {e}")
+        futures = [_delivery_executor.submit(self._post_one, chat_id, formatted_message)
+                   for chat_id in self.config.chat_ids]
+        success_count = sum(future.result() for future in futures)
 
         success = success_count > 0
         if success:
@@ -194,11 +333,28 @@ class TelegramProvider(NotificationProvider):
 
         return success
 
+    def _post_one(self, chat_id: str, text: str) -> bool:
+        try:
+            payload = {'chat_id': chat_id, 'text': text, 'parse_mode': 'Markdown'}
+            response = self.session.post(self.send_url, data=orjson.dumps(payload),
+                                         headers=JSON_HEADERS, timeout=10)
+            if 200 <= response.status_code < 300:
+                self.logger.debug("Telegram notification sent to %s", chat_id)
+                return True
+            self.logger.warning(f"Telegram notification failed for {chat_id}: {response.status_code}")
+        except Exception as e:
+            self.logger.error(f"Failed to send Telegram notification to {chat_id}: {e}")
+        return False
+
 class SlackProvider(NotificationProvider):
-    def __init__(self, webhook_url: str, enabled: bool = True):
+    def __init__(self, webhook_url: str, enabled: bool = True, session: requests.Session = None):
         self.webhook_url = webhook_url
+        self.host = urlsplit(webhook_url).netloc if webhook_url else ''
         self.enabled = enabled
         self.logger = logging.getLogger(__name__)
+        # Connessioni keep-alive verso il webhook: niente handshake TLS per messaggio.
+        # Più provider Slack possono condividere la stessa session (stesso host)
+        self.session = session or create_session()
 
     def send(self, title: str, message: str, priority: str = "medium", metadata: dict = None) -> bool:
         if not self.enabled or not self.webhook_url:
@@ -212,8 +368,9 @@ class SlackProvider(NotificationProvider):
             payload["text"] += f"\n\n*Dettagli:*\n{details}"
 
         try:
-            response = requests.post(self.webhook_url, json=payload, timeout=10)
-            if response.status_code == 200:
+            response = self.session.post(self.webhook_url, data=orjson.dumps(payload),
+                                         headers=JSON_HEADERS, timeout=10)
+            if 200 <= response.status_code < 300:
                 self.logger.info("Slack notification inviata con successo")
                 return True
             else:
@@ -224,24 +381,67 @@ class SlackProvider(NotificationProvider):
             return False
 
 class NotificationManager:
-    def __init__(self, config_file: str = None):
+    def __init__(self, config_file: str = None, debounce_seconds: float = DEFAULT_DEBOUNCE_SECONDS,
+                 dedup_seconds: float = DEFAULT_DEDUP_SECONDS, rate_limit: int = DEFAULT_RATE_LIMIT):
         self.logger = logging.getLogger(__name__)
         self.providers = []
+        self.debounce_seconds = debounce_seconds
+        self.dedup_seconds = dedup_seconds
+        # (titolo, messaggio, priorità) -> istante dell'ultimo invio
+        self._recent = {}
+        self.rate_limit = rate_limit
+        self._rate_window = deque()  # istanti degli invii nell'ultima finestra
+        self.stats = {'sent': 0, 'duplicates': 0, 'rate_limited': 0}
+        
+        # Coda degli invii asincroni, servita da un thread avviato al primo uso
+        self._queue = queue.Queue()
+        self._worker = None
+        self._lock = threading.Lock()
+        # (titolo, priorità) -> (fine finestra, [(messaggio, metadata) raggruppati])
+        self._pending = {}
+        # Pool per inviare in parallelo a più provider, creato al primo invio
+        # e ricreato solo se nel frattempo è cambiato il numero di provider
+        self._executor = None
+        self._executor_size = 0
 
         if config_file:
             self.load_configuration(config_file)
 
     def add_provider(self, provider: NotificationProvider):
-        self.providers.append(provider)
+        # Nuova lista invece di append: un invio in corso resta sull'elenco già letto
+        with self._lock:
+            self.providers = self.providers + [provider]
         self.logger.info(f"Aggiunto provider notifiche: {type(provider).__name__}")
 
+    def set_providers(self, providers: Iterable[NotificationProvider]):
+        """Sostituisce in un colpo solo l'elenco dei provider registrati"""
+        providers = list(providers)
+        with self._lock:
+            self.providers = providers
+        self.logger.info(f"Provider notifiche registrati: {len(providers)}")
+
+    def _get_executor(self, size: int) -> ThreadPoolExecutor:
+        """Pool con un thread per provider, ricreato se il loro numero cambia"""
+        size = max(1, size)
+        with self._lock:
+            if self._executor is None or self._executor_size != size:
+                if self._executor is not None:
+                    self._executor.shutdown(wait=False)
+                self._executor = ThreadPoolExecutor(max_workers=size, thread_name_prefix="notification")
+                self._executor_size = size
+            return self._executor
+
     def load_configuration(self, config_file: str):
         import yaml
+        loader = getattr(yaml, 'CSafeLoader', yaml.SafeLoader)
         try:
-            with open(config_file, 'r') as f:
-                config = yaml.safe_load(f)
+            with open(config_file, 'rb') as f:
+                config = yaml.load(f, Loader=loader)
 
             notifications_config = config.get('notifications', {})
+            self.debounce_seconds = notifications_config.get('debounce_seconds', self.debounce_seconds)
+            self.dedup_seconds = notifications_config.get('dedup_seconds', self.dedup_seconds)
+            self.rate_limit = notifications_config.get('rate_limit', self.rate_limit)
 
             if 'email' in notifications_config:
                 email_config = EmailConfig(**notifications_config['email'])
@@ -266,26 +466,171 @@ class NotificationManager:
         except Exception as e:
             self.logger.error(f"Impossibile caricare configurazione notifiche: {e}")
 
-    def send_notification(self, title: str, message: str, priority: str = "medium", metadata: Dict = None) -> bool:
+    def send_notification_async(self, title: str, message: str, priority: str = "medium", metadata: Dict = None) -> None:
+        """
+        Accoda la notifica e ritorna subito: l'I/O di rete avviene nel thread
+        di invio, senza bloccare il chiamante (es. il ciclo di rilevamento).
+        La prima notifica con un certo titolo e priorità parte subito; le
+        uguali nei debounce_seconds successivi vengono raggruppate in un solo
+        invio alla chiusura della finestra.
+        """
         if not self.providers:
+            # Niente da inviare: nessun thread di invio, accodamento o debounce
             self.logger.warning("Nessun provider di notifiche configurato")
-            return False
+            return
+        key = (title, priority)
+        now = time.monotonic()
+        with self._lock:
+            if self._worker is None:
+                self._worker = threading.Thread(target=self._send_worker, daemon=True)
+                self._worker.start()
+            pending = self._pending.get(key)
+            if pending is not None and now < pending[0]:
+                pending[1].append((message, metadata))
+                return
+            if self.debounce_seconds > 0:
+                self._pending[key] = (now + self.debounce_seconds, [])
+        self._queue.put((title, message, priority, metadata))
+
+    def _admit(self, title: str, message: str, priority: str, dedup: bool = True) -> Optional[str]:
+        """
+        Decide se la notifica va inviata: None se sì, altrimenti il motivo
+        ('duplicates' o 'rate_limited', le chiavi di self.stats). La notifica
+        diventa un duplicato solo dopo un invio riuscito (_record_sent)
+        """
+        key = (title, message, priority)
+        now = time.monotonic()
+        with self._lock:
+            if dedup and self.dedup_seconds > 0:
+                last = self._recent.get(key)
+                if last is not None and now - last < self.dedup_seconds:
+                    self.stats['duplicates'] += 1
+                    return 'duplicates'
+            
+            # Limite a finestra scorrevole; le notifiche ad alta priorità passano sempre
+            window = self._rate_window
+            while window and window[0] <= now - RATE_LIMIT_WINDOW:
+                window.popleft()
+            if priority != 'high' and len(window) >= self.rate_limit:
+                self.stats['rate_limited'] += 1
+                return 'rate_limited'
+            window.append(now)
+        return None
+
+    def _record_sent(self, title: str, message: str, priority: str):
+        """Registra una notifica consegnata ad almeno un provider"""
+        key = (title, message, priority)
+        now = time.monotonic()
+        with self._lock:
+            if self.dedup_seconds > 0:
+                # Le voci scadute vengono eliminate solo quando si registra un invio
+                cutoff = now - self.dedup_seconds
+                self._recent = {k: t for k, t in self._recent.items() if t > cutoff}
+                self._recent[key] = now
+            self.stats['sent'] += 1
+
+    def get_stats(self) -> Dict:
+        with self._lock:
+            return dict(self.stats)
+
+    def _send_worker(self):
+        while True:
+            # Le notifiche accodate entro BATCH_WAIT dalla prima partono insieme
+            batch = []
+            try:
+                batch.append(self._queue.get(timeout=1.0))
+                deadline = time.monotonic() + BATCH_WAIT
+                while True:
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        break
+                    batch.append(self._queue.get(timeout=remaining))
+            except queue.Empty:
+                pass
+            if batch:
+                self.send_notifications(batch)
+            self._flush_debounced()
+
+    def _flush_debounced(self):
+        now = time.monotonic()
+        with self._lock:
+            expired = [(key, grouped) for key, (deadline, grouped) in self._pending.items()
+                       if deadline <= now]
+            for key, _ in expired:
+                del self._pending[key]
+        alerts = []
+        for (title, priority), grouped in expired:
+            if not grouped:
+                continue
+            messages = list(dict.fromkeys(message for message, _ in grouped))
+            metadata = {"notifiche_raggruppate": len(grouped)}
+            details = [item for _, item in grouped if item]
+            if details:
+                metadata["dettagli"] = details
+            alerts.append((title, "\n".join(messages), priority, metadata))
+        if alerts:
+            # Il riepilogo di un gruppo ha spesso lo stesso testo della prima notifica,
+            # inviata da meno di dedup_seconds: non va scartato come duplicato
+            self.send_notifications(alerts, dedup=False)
+
+    def send_notification(self, title: str, message: str, priority: str = "medium", metadata: Dict = None) -> bool:
+        return self.send_notifications([(title, message, priority, metadata)])[0]
 
-        success_count = 0
-        for provider in self.providers:
+    def send_notifications(self, alerts: List[Tuple[str, str, str, Optional[Dict]]],
+                           dedup: bool = True) -> List[bool]:
+        """
+        Invia un lotto di (titolo, messaggio, priorità, metadata): ogni provider
+        riceve le notifiche ammesse con una sola send_batch. Un esito per notifica.
+        Con dedup=False le notifiche non vengono confrontate con quelle recenti
+        """
+        # Elenco letto una sola volta: add_provider e set_providers lo sostituiscono
+        # senza modificarlo, quindi pool, invii ed esiti usano gli stessi provider
+        providers = self.providers
+        if not providers:
+            self.logger.warning("Nessun provider di notifiche configurato")
+            return [False] * len(alerts)
+
+        results = [True] * len(alerts)
+        admitted = []
+        for i, (title, message, priority, _) in enumerate(alerts):
+            rejected = self._admit(title, message, priority, dedup)
+            if rejected == 'duplicates':
+                # Si registrano solo invii riusciti: l'esito resta quello (True) del primo invio
+                self.logger.debug("Notifica duplicata scartata: %s", title)
+            elif rejected == 'rate_limited':
+                self.logger.warning(f"Notifica scartata per limite di {self.rate_limit} invii "
+                                    f"ogni {RATE_LIMIT_WINDOW:.0f}s (priorità {priority}): {title}")
+                results[i] = False
+            else:
+                admitted.append(i)
+        if not admitted:
+            return results
+
+        # Un provider lento (es. SMTP) non ritarda gli altri: la latenza è
+        # quella del più lento, non la somma
+        batch = [alerts[i] for i in admitted]
+        executor = self._get_executor(len(providers))
+        futures = [(provider, executor.submit(provider.send_batch, batch))
+                   for provider in providers]
+        success_counts = [0] * len(batch)
+        for provider, future in futures:
             try:
-                if provider.send(title, message, priority, metadata):
-                    success_count += 1
+                for j, sent in enumerate(future.result()):
+                    if sent:
+                        success_counts[j] += 1
             except Exception as e:
                 self.logger.error(f"Errore provider notifiche {type(provider).__name__}: {e}")
 
-        success = success_count > 0
-        if success:
-            self.logger.info(f"Notifica inviata con successo tramite {success_count}/{len(self.providers)} provider")
-        else:
-            self.logger.error("Impossibile inviare notifica tramite qualsiasi provider")
+        for i, success_count in zip(admitted, success_counts):
+            results[i] = success_count > 0
+            if results[i]:
+                title, message, priority, _ = alerts[i]
+                self._record_sent(title, message, priority)
+                self.logger.info(f"Notifica inviata con successo tramite {success_count}/{len(providers)} provider")
+            else:
+                self.logger.error("Impossibile inviare notifica tramite qualsiasi provider")
 
-        return success
+        return results
 
 if __name__ == "__main__":
     logging.basicConfig(level=logging.INFO)
@@ -1,15 +1,34 @@
 # RTSP Client Module for ESP32 Camera Streams
 # Handles RTSP stream connection and frame processing for Shima monitoring
 
+import os
 import cv2
 import threading
-import queue
 import logging
 import time
-from typing import Optional, Callable, Dict
+from typing import Optional, Callable, Dict, Tuple
 from dataclasses import dataclass
 import numpy as np
 
+# FFmpeg demuxer options for the OpenCV backend: no input buffering and
+# low-delay decoding, so frames are handed over as soon as they arrive.
+# Setting the variable replaces OpenCV's built-in RTSP default (TCP transport),
+# so TCP is requested explicitly to keep cameras off FFmpeg's UDP-first default
+FFMPEG_LOW_LATENCY_OPTIONS = "rtsp_transport;tcp|fflags;nobuffer|flags;low_delay"
+# OPENCV_FFMPEG_CAPTURE_OPTIONS is process-wide (OpenCV reads it whenever any
+# stream is opened), so it is applied once here for all streams; a value
+# already set in the environment wins
+os.environ.setdefault("OPENCV_FFMPEG_CAPTURE_OPTIONS", FFMPEG_LOW_LATENCY_OPTIONS)
+
+# Hardware decode backends accepted by RTSPConfig.hwaccel
+HW_ACCELERATION = {
+    "none": cv2.VIDEO_ACCELERATION_NONE,
+    "any": cv2.VIDEO_ACCELERATION_ANY,
+    "vaapi": cv2.VIDEO_ACCELERATION_VAAPI,
+    "d3d11": cv2.VIDEO_ACCELERATION_D3D11,
+    "mfx": cv2.VIDEO_ACCELERATION_MFX,
+}
+
 @dataclass
 class RTSPConfig:
     """RTSP stream configuration"""
@@ -20,6 +39,7 @@ class RTSPConfig:
     buffer_size: int = 1
     fps: int = 15
     resolution: tuple = (640, 480)
+    hwaccel: str = "none"
 
 class RTSPClient:
     """
@@ -30,13 +50,23 @@ class RTSPClient:
     def __init__(self, config: RTSPConfig):
         self.config = config
         self.logger = logging.getLogger(__name__)
+        # Credentials are fixed per client: build the URL (and its masked form
+        # for logging) once instead of on every reconnection
+        self._rtsp_url = self._build_rtsp_url()
+        self._rtsp_url_masked = (self._rtsp_url.replace(config.password, '***')
+                                 if config.password else self._rtsp_url)
         
-        # Stream state
-        self.is_running = False
+        # Stream state (the event is set while the client is stopped)
+        self._stop_event = threading.Event()
+        self._stop_event.set()
         self.cap = None
-        self.frame_queue = queue.Queue(maxsize=config.buffer_size)
         self.current_frame = None
+        self.frame_seq = 0
+        # Last frame_seq handed out by get_frame_from_queue: the current frame
+        # is the single "latest frame wins" slot, pending while the two differ
+        self._consumed_seq = 0
         self.last_frame_time = 0
+        self._frame_cond = threading.Condition()
         
         # Threading
         self.capture_thread = None
@@ -53,6 +83,10 @@ class RTSPClient:
         # Callbacks
         self.frame_callback = None
         self.error_callback = None
+    
+    @property
+    def is_running(self) -> bool:
+        return not self._stop_event.is_set()
         
     def _build_rtsp_url(self) -> str:
         """Build RTSP URL with authentication if provided"""
@@ -69,13 +103,18 @@ class RTSPClient:
     def _create_capture(self) -> Optional[cv2.VideoCapture]:
         """Create and configure video capture object"""
         try:
-            rtsp_url = self._build_rtsp_url()
-            self.logger.info(f"Connecting to RTSP stream: {rtsp_url.replace(self.config.password or '', '***')}")
+            rtsp_url = self._rtsp_url
+            self.logger.info(f"Connecting to RTSP stream: {self._rtsp_url_masked}")
             
-            cap = cv2.VideoCapture(rtsp_url)
+            hw_acceleration = HW_ACCELERATION.get(self.config.hwaccel)
+            if hw_acceleration is None:
+                self.logger.warning(f"Unknown hwaccel '{self.config.hwaccel}', using software decoding")
+                hw_acceleration = cv2.VIDEO_ACCELERATION_NONE
+            cap = cv2.VideoCapture(rtsp_url, cv2.CAP_FFMPEG,
+                                   [cv2.CAP_PROP_HW_ACCELERATION, hw_acceleration])
             
             # Set capture properties for optimal performance
-            cap.set(cv2.CAP_PROP_BUFFER_SIZE, self.config.buffer_size)
+            cap.set(cv2.CAP_PROP_BUFFERSIZE, self.config.buffer_size)
             cap.set(cv2.CAP_PROP_FPS, self.config.fps)
             
             # Set timeout for connection
@@ -93,7 +132,10 @@ class RTSPClient:
                 cap.release()
                 return None
             
-            self.logger.info(f"RTSP stream connected successfully. Frame size: {frame.shape}")
+            hw_used = int(cap.get(cv2.CAP_PROP_HW_ACCELERATION))
+            decoder = next((name for name, value in HW_ACCELERATION.items() if value == hw_used), hw_used)
+            self.logger.info(f"RTSP stream connected successfully. Frame size: {frame.shape}, "
+                             f"hardware decoding: {decoder}")
             return cap
             
         except Exception as e:
@@ -104,21 +146,32 @@ class RTSPClient:
         """Main capture loop running in separate thread"""
         frame_count = 0
         fps_counter_start = time.time()
+        # Frames beyond config.fps are grabbed (keeping the stream drained)
+        # but not converted to BGR
+        frame_interval = 1.0 / self.config.fps if self.config.fps else 0.0
+        next_retrieve = 0.0
         
         while self.is_running:
             try:
                 if self.cap is None or not self.cap.isOpened():
                     self.logger.warning("RTSP connection lost, attempting reconnection...")
                     self._attempt_reconnection()
-                    time.sleep(1)
+                    self._stop_event.wait(1)
                     continue
                 
-                ret, frame = self.cap.read()
-                
-                if not ret:
+                if not self.cap.grab():
                     self.logger.warning("Failed to read frame from RTSP stream")
                     self.stats['connection_errors'] += 1
-                    time.sleep(0.1)
+                    self._stop_event.wait(0.1)
+                    continue
+                
+                now = time.monotonic()
+                if now < next_retrieve:
+                    continue
+                next_retrieve = max(next_retrieve + frame_interval, now)
+                
+                ret, frame = self.cap.retrieve()
+                if not ret:
                     continue
                 
                 # Update statistics
@@ -132,24 +185,19 @@ class RTSPClient:
                     frame_count = 0
                     fps_counter_start = current_time
                 
-                # Store current frame
-                self.current_frame = frame.copy()
-                self.last_frame_time = current_time
-                
-                # Add frame to queue (non-blocking)
-                try:
-                    if not self.frame_queue.full():
-                        self.frame_queue.put_nowait(frame)
-                    else:
-                        # Drop oldest frame if buffer is full
-                        try:
-                            self.frame_queue.get_nowait()
-                            self.stats['frames_dropped'] += 1
-                        except queue.Empty:
-                            pass
-                        self.frame_queue.put_nowait(frame)
-                except queue.Full:
-                    self.stats['frames_dropped'] += 1
+                # Publish current frame (retrieve() returns a fresh array, consumers
+                # share it read-only) and wake up any waiting reader. The array is
+                # flagged read-only so a consumer drawing on it fails loudly
+                # instead of corrupting the frame for the others
+                frame.setflags(write=False)
+                with self._frame_cond:
+                    if self.frame_seq != self._consumed_seq:
+                        # Replacing a frame nobody took from the slot
+                        self.stats['frames_dropped'] += 1
+                    self.current_frame = frame
+                    self.frame_seq += 1
+                    self.last_frame_time = current_time
+                    self._frame_cond.notify_all()
                 
                 # Call frame callback if set
                 if self.frame_callback:
@@ -162,7 +210,7 @@ class RTSPClient:
                 self.logger.error(f"Error in capture loop: {e}")
                 if self.error_callback:
                     self.error_callback(e)
-                time.sleep(1)
+                self._stop_event.wait(1)
     
     def _attempt_reconnection(self):
         """Attempt to reconnect to RTSP stream"""
@@ -178,8 +226,9 @@ class RTSPClient:
                 self.cap.release()
                 self.cap = None
             
-            # Wait before reconnecting
-            time.sleep(2 ** attempt)  # Exponential backoff
+            # Wait before reconnecting (exponential backoff, interrupted by stop())
+            if self._stop_event.wait(2 ** attempt):
+                break
             
             # Create new connection
             self.cap = self._create_capture()
@@ -201,7 +250,7 @@ class RTSPClient:
         if not self.cap:
             return False
         
-        self.is_running = True
+        self._stop_event.clear()
         
         # Start capture thread
         self.capture_thread = threading.Thread(target=self._capture_frames, daemon=True)
@@ -216,7 +265,9 @@ class RTSPClient:
             return
         
         self.logger.info("Stopping RTSP client...")
-        self.is_running = False
+        self._stop_event.set()
+        with self._frame_cond:
+            self._frame_cond.notify_all()
         
         # Wait for threads to finish
         if self.capture_thread:
@@ -227,27 +278,34 @@ class RTSPClient:
             self.cap.release()
             self.cap = None
         
-        # Clear frame queue
-        while not self.frame_queue.empty():
-            try:
-                self.frame_queue.get_nowait()
-            except queue.Empty:
-                break
+        # Discard any pending frame
+        with self._frame_cond:
+            self._consumed_seq = self.frame_seq
         
         self.logger.info("RTSP client stopped")
     
     def get_latest_frame(self) -> Optional[np.ndarray]:
-        """Get the most recent frame"""
+        """Get the most recent frame (shared and read-only: copy it before drawing)"""
         if not self.is_running:
             return None
         return self.current_frame
     
+    def wait_for_frame(self, last_seq: int, timeout: float = 1.0) -> Tuple[int, Optional[np.ndarray]]:
+        """Wait for a frame newer than last_seq, return (seq, frame)"""
+        with self._frame_cond:
+            self._frame_cond.wait_for(lambda: self.frame_seq != last_seq or not self.is_running, timeout)
+            # Also counts as consumption, so frames_dropped and queue_size stay accurate
+            self._consumed_seq = self.frame_seq
+            return self.frame_seq, self.current_frame
+    
     def get_frame_from_queue(self, timeout: float = 1.0) -> Optional[np.ndarray]:
-        """Get frame from queue with timeout"""
-        try:
-            return self.frame_queue.get(timeout=timeout)
-        except queue.Empty:
-            return None
+        """Take the pending frame, waiting up to timeout; each frame is returned once"""
+        with self._frame_cond:
+            self._frame_cond.wait_for(lambda: self.frame_seq != self._consumed_seq or not self.is_running, timeout)
+            if self.frame_seq == self._consumed_seq:
+                return None
+            self._consumed_seq = self.frame_seq
+            return self.current_frame
     
     def set_frame_callback(self, callback: Callable[[np.ndarray], None]):
         """Set callback function called for each new frame"""
@@ -261,7 +319,7 @@ class RTSPClient:
         """Get stream statistics"""
         stats = self.stats.copy()
         stats['is_connected'] = self.cap is not None and self.cap.isOpened()
-        stats['queue_size'] = self.frame_queue.qsize()
+        stats['queue_size'] = int(self.frame_seq != self._consumed_seq)
         stats['last_frame_age'] = time.time() - self.last_frame_time if self.last_frame_time > 0 else float('inf')
         return stats
     
@@ -311,6 +369,13 @@ class RTSPManager:
             return self.clients[stream_id].get_latest_frame()
         return None
     
+    def wait_for_frame(self, stream_id: str, last_seq: int, timeout: float = 1.0) -> Tuple[int, Optional[np.ndarray]]:
+        """Wait for a new frame from specific stream"""
+        client = self.clients.get(stream_id)
+        if client is None:
+            return last_seq, None
+        return client.wait_for_frame(last_seq, timeout)
+    
     def get_all_stats(self) -> Dict:
         """Get statistics for all streams"""
         return {stream_id: client.get_stats() 
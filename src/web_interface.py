@@ -1,11 +1,19 @@
-from flask import Flask, Response, render_template_string
+import os
+from flask import Flask, Response
 import cv2
-from led_detector import LEDDetector, LEDRegion, LEDStatus
+from waitress import serve
+from led_detector import LEDDetector, LEDRegion, LEDStatus, STATUS_BGR_COLORS
 
 app = Flask(__name__)
 
 RTSP_URL = "rtsp://192.168.21.213:8554"  # Modifica con il tuo RTSP
 
+JPEG_PARAMS = [cv2.IMWRITE_JPEG_QUALITY, 70, cv2.IMWRITE_JPEG_OPTIMIZE, 0]
+MJPEG_PART_HEADER = b'--frame\r\nContent-Type: image/jpeg\r\nContent-Length: %d\r\n\r\n'
+# Il rilevamento gira un frame ogni N (a 15 fps, N=5 => 3 volte al secondo):
+# lo stato dei LED cambia su tempi umani, nei frame intermedi si riusa l'ultimo
+DETECTION_INTERVAL = max(1, int(os.environ.get('DETECTION_INTERVAL', 5)))
+
 # Configura le regioni LED
 led_regions = [
     LEDRegion("status_main", 120, 80, 40, 40, "SHIMA_001"),
@@ -14,31 +22,24 @@ led_regions = [
 
 led_detector = LEDDetector()
 
-@app.route('/')
-def index():
-    html = """
+# Pagina statica: codificata una volta all'import, senza passare da Jinja
+INDEX_HTML = """
     <html><head><title>Shima Monitor</title></head>
     <body>
     <h1>Benvenuto nel sistema Shima Monitor</h1>
     <p>Per vedere il video, visita: <a href="/video_feed">Stream Video</a></p>
     </body></html>
-    """
-    return render_template_string(html)
+    """.encode('utf-8')
+
+@app.route('/')
+def index():
+    return Response(INDEX_HTML, mimetype='text/html')
 
 def draw_overlay(frame, detections):
-    color_map = {
-        LEDStatus.OFF: (128, 128, 128),
-        LEDStatus.GREEN: (0, 255, 0),
-        LEDStatus.YELLOW: (0, 255, 255),
-        LEDStatus.RED: (0, 0, 255),
-        LEDStatus.FLASHING_GREEN: (0, 128, 0),
-        LEDStatus.FLASHING_YELLOW: (0, 128, 255),
-        LEDStatus.FLASHING_RED: (0, 0, 128)
-    }
     for det in detections:
         region = det.region
-        color = color_map.get(det.status, (255, 255, 255))
-        cv2.rectangle(frame, (region.x, region.y), (region.x + region.width, region.y + region.height), color, 2)
+        color = STATUS_BGR_COLORS[det.status]
+        cv2.rectangle(frame, (region.x, region.y), (region.x1, region.y1), color, 2)
         label = f"{region.name}: {det.status.value}"
         cv2.putText(frame, label, (region.x, region.y - 10), cv2.FONT_HERSHEY_SIMPLEX, 0.6, color, 2)
     return frame
@@ -48,6 +49,8 @@ def gen_frames(rtsp_url):
     if not cap.isOpened():
         print(f"Errore: impossibile aprire il flusso RTSP {rtsp_url}")
         return
+    frame_idx = 0
+    detections = []
     while True:
         success, frame = cap.read()
         if not success:
@@ -55,15 +58,19 @@ def gen_frames(rtsp_url):
             break
 
         # Rileva stato LED nel frame
-        detections = led_detector.detect_multiple_leds(frame, led_regions)
+        if frame_idx % DETECTION_INTERVAL == 0:
+            detections = led_detector.detect_multiple_leds(frame, led_regions)
+        frame_idx += 1
 
         # Disegna overlay
         frame_with_overlay = draw_overlay(frame, detections)
 
-        ret, buffer = cv2.imencode('.jpg', frame_with_overlay)
-        frame_bytes = buffer.tobytes()
-        yield (b'--frame\r\n'
-               b'Content-Type: image/jpeg\r\n\r\n' + frame_bytes + b'\r\n')
+        ret, buffer = cv2.imencode('.jpg', frame_with_overlay, JPEG_PARAMS)
+        if not ret:
+            continue
+        yield MJPEG_PART_HEADER % buffer.nbytes
+        yield buffer.tobytes()
+        yield b'\r\n'
 
 @app.route('/video_feed')
 def video_feed():
@@ -71,4 +78,5 @@ def video_feed():
                     mimetype='multipart/x-mixed-replace; boundary=frame')
 
 if __name__ == '__main__':
-    app.run(host='0.0.0.0', port=8080, debug=True)
+    # Server WSGI multi-thread: ogni stream MJPEG occupa un thread
+    serve(app, host='0.0.0.0', port=8080, threads=8, channel_timeout=60)
@@ -0,0 +1,38 @@
+import sys
+import os
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), 'src'))
+
+import itertools
+import cv2
+import numpy as np
+from led_detector import LEDDetector, LEDStatus, HSV_COLOR_RANGES, RED_HSV_RANGE_2
+
+def in_range_masks(hsv):
+    # Classificazione originale: un inRange per fascia, rosso come unione delle due
+    green = cv2.inRange(hsv, HSV_COLOR_RANGES[LEDStatus.GREEN]['lower'],
+                        HSV_COLOR_RANGES[LEDStatus.GREEN]['upper'])
+    yellow = cv2.inRange(hsv, HSV_COLOR_RANGES[LEDStatus.YELLOW]['lower'],
+                         HSV_COLOR_RANGES[LEDStatus.YELLOW]['upper'])
+    red = cv2.bitwise_or(
+        cv2.inRange(hsv, HSV_COLOR_RANGES[LEDStatus.RED]['lower'],
+                    HSV_COLOR_RANGES[LEDStatus.RED]['upper']),
+        cv2.inRange(hsv, RED_HSV_RANGE_2['lower'], RED_HSV_RANGE_2['upper']))
+    return cv2.merge((green, yellow, red))
+
+def test_lut_masks_match_in_range():
+    detector = LEDDetector()
+
+    # Tutti i valori a cavallo dei limiti delle fasce, combinati tra i canali
+    limits = [{0, 255} for _ in range(3)]
+    for bounds in (*HSV_COLOR_RANGES.values(), RED_HSV_RANGE_2):
+        for channel in range(3):
+            for value in (int(bounds['lower'][channel]), int(bounds['upper'][channel])):
+                limits[channel].update(v for v in (value - 1, value, value + 1) if 0 <= v <= 255)
+    edges = np.array(list(itertools.product(*limits)), dtype=np.uint8)
+
+    # Più un campione casuale di tutto lo spazio HSV
+    rng = np.random.default_rng(0)
+    samples = rng.integers(0, 256, size=(100000, 3), dtype=np.uint8)
+
+    hsv = np.concatenate((edges, samples)).reshape(1, -1, 3)
+    assert np.array_equal(detector.range_masks(hsv), in_range_masks(hsv))
@@ -2,32 +2,45 @@ import sys
 import os
 sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), 'src'))
 
-import yaml
 import logging
-from notification_system import NotificationManager, SlackProvider
+from config.settings import load_yaml_cached, validate_camera_config
+from notification_system import NotificationManager, SlackProvider, create_session, DELIVERY_WORKERS
+
+logger = logging.getLogger(__name__)
 
 def test_slack_notifications_per_camera():
-    with open('cameras.yaml', 'r') as f:
-        cameras_config = yaml.safe_load(f)
+    # Stessa cache JSON di cameras.yaml usata da main.py
+    cameras_config = load_yaml_cached('cameras.yaml')
+    cameras = cameras_config.get('cameras', ())
+    # Tipi controllati una volta al caricamento: slack_webhook_url è una stringa o assente
+    for camera in cameras:
+        validate_camera_config(camera)
 
     manager = NotificationManager()
+    # Una sola session (pool di connessioni keep-alive) per tutti i webhook Slack
+    session = create_session(pool_maxsize=DELIVERY_WORKERS)
+
+    # Una sola passata sulle camere: (machine_id, URL ripulito) di quelle con webhook
+    targets = [(str(camera.get('machine_id')), webhook_url.strip().strip("[]()"))
+               for camera in cameras
+               if (webhook_url := camera.get('slack_webhook_url'))]
+    if not targets:
+        return
+
+    # Un provider per camera, registrati tutti insieme prima dell'invio
+    for machine_id, cleaned_url in targets:
+        logger.debug("Using cleaned webhook URL for camera %s: '%s'", machine_id, cleaned_url)
+    manager.set_providers(SlackProvider(cleaned_url, session=session) for _, cleaned_url in targets)
+    machine_ids = [machine_id for machine_id, _ in targets]
 
-    for camera in cameras_config.get('cameras', []):
-        webhook_url = camera.get('slack_webhook_url')
-        print(f"Testing webhook URL: '{webhook_url}'")  # Debug
-        if webhook_url and isinstance(webhook_url, str):
-            cleaned_url = webhook_url.strip().strip("[]()")
-            print(f"Using cleaned webhook URL: '{cleaned_url}'")  # Debug
-            slack_provider = SlackProvider(cleaned_url)
-            manager.add_provider(slack_provider)
-            success = manager.send_notification(
-                title="Test Notifica Slack per Camera",
-                message=f"Notifica di prova per camera {camera.get('machine_id')}",
-                priority="high",
-                metadata={"test": "valore"}
-            )
-            print(f"Invio notifica per camera {camera.get('machine_id')}: {'Successo' if success else 'Fallito'}")
-            manager.providers.clear()
+    # Una sola notifica: il manager la invia in parallelo a tutti i webhook
+    success = manager.send_notification(
+        title="Test Notifica Slack per Camera",
+        message=f"Notifica di prova per le camere {', '.join(machine_ids)}",
+        priority="high",
+        metadata={"test": "valore"}
+    )
+    logger.info("Invio notifica per le camere %s: %s", ', '.join(machine_ids), 'Successo' if success else 'Fallito')
 
 if __name__ == "__main__":
     logging.basicConfig(level=logging.INFO)